@@ -36,22 +36,29 @@ class ClipDictionary:
 
         return self
 
-    def toObject(self):
+    def toObjectSteps(self):
+        """Same as toObject, yields the dictionary object after every clip and animation"""
         dictNode = bpy.data.objects.new('Clip Dictionary', None)
         bpy.context.collection.objects.link(dictNode)
+        dictNode.sollumtype = "Clip Dictionary"
 
         print('Creating clip objects')
         for clip in self.Clips:
             clipNode = clip.toObject()
             clipNode.parent = dictNode
+            yield dictNode
 
         print('Creating anim objects')
         for anim in self.Animations:
             print('Creating anim', anim.Hash)
             animNode = anim.toObject()
             animNode.parent = dictNode
+            yield dictNode
 
-        dictNode.sollumtype = "Clip Dictionary"
+    def toObject(self):
+        dictNode = None
+        for dictNode in self.toObjectSteps():
+            pass
 
         return dictNode
 
@@ -1,6 +1,7 @@
 import bpy
 import os 
 from .tools import meshgen as MeshGen
+from .ydrimport import load_scene_lods
 from bpy.types import PropertyGroup, Panel, UIList, Operator
 from bpy.props import CollectionProperty, PointerProperty, StringProperty, IntProperty, BoolProperty, FloatProperty
 
@@ -108,6 +109,7 @@ def bounds_update(self, context):
 
 def scene_lod_update(self, context):
     lod = self.level_of_detail
+    load_scene_lods(context.scene, lod)
 
     for obj in context.scene.objects: 
         if lod == "All":
@@ -4,11 +4,25 @@ if "bpy" in locals():
     importlib.reload(cats)
     importlib.reload(meshgen)
     importlib.reload(jenkhash)
+    importlib.reload(vertexbuffer)
+    importlib.reload(textures)
+    importlib.reload(drawableparse)
+    importlib.reload(importcache)
+    importlib.reload(importprogress)
+    importlib.reload(importoptions)
+    importlib.reload(xmlwriter)
 else:
     from . import xml
     from . import cats
     from . import meshgen
     from . import cats
     from . import jenkhash
+    from . import vertexbuffer
+    from . import textures
+    from . import drawableparse
+    from . import importcache
+    from . import importprogress
+    from . import importoptions
+    from . import xmlwriter
 
 import bpy
\ No newline at end of file
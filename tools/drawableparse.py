@@ -0,0 +1,78 @@
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+from .vertexbuffer import VertexBuffer
+
+# nothing in here may use bpy, these functions also run in the parse worker processes
+
+def get_vertices_from_data(layout, data):
+    return VertexBuffer.from_text([item.tag for item in layout], data)
+
+def get_index_buffer(data):
+    indices = np.fromstring(data, dtype=np.uint32, sep=" ")
+
+    if len(indices) % 3 != 0:
+        print("Incorrect index buffer data!")
+        indices = indices[:len(indices) - len(indices) % 3]
+
+    return indices.reshape(-1, 3) #one row per triangle
+
+def read_geometry_buffers(geometry):
+    vb = geometry.find("VertexBuffer")
+    ib = geometry.find("IndexBuffer")
+
+    vertices = get_vertices_from_data(vb.find("Layout"), vb[2].text)
+    index_buffer = get_index_buffer(ib[0].text)
+
+    return vertices, index_buffer
+
+def iter_drawable_geometries(drawable):
+    #(lod key, model, geometry) for every geometry of a drawable in document order
+    for dm_node in drawable:
+        if not dm_node.tag.startswith("DrawableModels"):
+            continue
+
+        key = dm_node.tag[len("DrawableModels"):]
+        for model in dm_node:
+            for geometries in model.iter("Geometries"):
+                for geometry in geometries:
+                    yield key, model, geometry
+
+def parse_drawable(data, lods=None):
+    #decodes every geometry of one drawable xml item and strips the buffer text from the returned element
+    drawable = ET.fromstring(data)
+
+    # levels that are not imported are dropped before anything gets decoded
+    if lods != None:
+        for dm_node in list(drawable):
+            if dm_node.tag.startswith("DrawableModels") and dm_node.tag[len("DrawableModels"):] not in lods:
+                drawable.remove(dm_node)
+
+    buffers = []
+    for key, model, geometry in iter_drawable_geometries(drawable):
+        buffers.append(read_geometry_buffers(geometry))
+        geometry.find("VertexBuffer")[2].text = None
+        geometry.find("IndexBuffer")[0].text = None
+
+    return drawable, buffers
+
+def split_dictionary_items(data):
+    #byte ranges of the top level <Item> elements of a DrawableDictionary, found without parsing the xml
+    ranges = []
+    depth = 0
+    start = 0
+
+    for match in re.finditer(rb"<(/?)Item\b([^>]*)>", data):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                ranges.append((start, match.end()))
+        elif match.group(2).endswith(b"/"):
+            if depth == 0:
+                ranges.append((match.start(), match.end()))
+        else:
+            if depth == 0:
+                start = match.start()
+            depth += 1
+
+    return ranges
@@ -0,0 +1,168 @@
+import io
+import os
+import hashlib
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+from .vertexbuffer import VertexBuffer
+
+# bump when the stored layout changes so old entries are parsed again
+cache_version = 1
+
+default_cache_folder = os.path.join(tempfile.gettempdir(), "sollumz_cache")
+default_max_size = 1024 * 1024 * 1024
+
+class ImportCache:
+    """Keeps the decoded drawables of imported files as .npz, evicting the least recently used past max_size bytes"""
+
+    def __init__(self, folder=None, max_size=default_max_size):
+        self.folder = folder if folder != None else default_cache_folder
+        self.max_size = max_size
+
+    def get_entry_path(self, filepath):
+        source = os.path.normcase(os.path.abspath(filepath))
+        return os.path.join(self.folder, hashlib.sha1(source.encode("utf-8")).hexdigest() + ".npz")
+
+    @staticmethod
+    def get_file_hash(filepath):
+        with open(filepath, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def load(self, filepath):
+        #(drawable, buffers) list as returned by parse_drawable, None when there is no valid entry
+        entry_path = self.get_entry_path(filepath)
+        if not os.path.isfile(entry_path):
+            return None
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as entry:
+                if int(entry["version"]) != cache_version:
+                    return None
+
+                # a touched but unchanged file is still found through its content
+                stat = os.stat(filepath)
+                if int(entry["mtime"]) != stat.st_mtime_ns or int(entry["size"]) != stat.st_size:
+                    if str(entry["hash"]) != self.get_file_hash(filepath):
+                        return None
+
+                parsed = self.read_entry(entry)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile, ET.ParseError) as e:
+            print("Import cache entry of " + filepath + " can't be read: " + str(e))
+            return None
+
+        # entries are evicted by last use
+        os.utime(entry_path)
+        return parsed
+
+    @staticmethod
+    def read_entry(entry):
+        parsed = []
+        for d, geometry_count in enumerate(entry["geometry_counts"].tolist()):
+            drawable = ET.fromstring(entry["xml.%d" % d].tobytes())
+
+            buffers = []
+            for g in range(geometry_count):
+                prefix = "%d.%d." % (d, g)
+                buffers.append((ImportCache.read_vertices(entry, prefix), entry[prefix + "index"]))
+            parsed.append((drawable, buffers))
+
+        return parsed
+
+    @staticmethod
+    def read_vertices(entry, prefix=""):
+        if prefix + "layout" not in entry.files:
+            return None
+
+        layout = entry[prefix + "layout"].tolist()
+        vertices = VertexBuffer(layout)
+        for semantic in layout:
+            vertices.set(semantic, entry[prefix + semantic])
+
+        return vertices
+
+    @staticmethod
+    def add_vertices(arrays, vertices, prefix=""):
+        if vertices is None:
+            return
+
+        arrays[prefix + "layout"] = np.array(vertices.layout)
+        for semantic in vertices.layout:
+            arrays[prefix + semantic] = vertices.get(semantic)
+
+    @staticmethod
+    def write_entry(entry_path, arrays):
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # written next to the entry first so a cancelled write never leaves a broken entry
+        with open(entry_path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(entry_path + ".tmp", entry_path)
+
+    def save(self, filepath, data, parsed):
+        #data is the content of the file the drawables were parsed from
+        stat = os.stat(filepath)
+        arrays = {
+            "version": np.array(cache_version),
+            "mtime": np.array(stat.st_mtime_ns, dtype=np.int64),
+            "size": np.array(stat.st_size, dtype=np.int64),
+            "hash": np.array(hashlib.sha1(data).hexdigest()),
+            "geometry_counts": np.array([len(buffers) for drawable, buffers in parsed], dtype=np.int64),
+        }
+
+        for d, (drawable, buffers) in enumerate(parsed):
+            arrays["xml.%d" % d] = np.frombuffer(ET.tostring(drawable), dtype=np.uint8)
+            for g, (vertices, index_buffer) in enumerate(buffers):
+                prefix = "%d.%d." % (d, g)
+                arrays[prefix + "index"] = index_buffer
+                self.add_vertices(arrays, vertices, prefix)
+
+        entry_path = self.get_entry_path(filepath)
+        try:
+            self.write_entry(entry_path, arrays)
+        except OSError as e:
+            print("Import cache entry of " + filepath + " can't be written: " + str(e))
+            return
+
+        self.evict(entry_path)
+
+    def evict(self, keep=None):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+def pack_geometry(vertices, index_buffer):
+    #one decoded geometry as .npz bytes, for keeping it inside the blend file
+    arrays = {"version": np.array(cache_version), "index": index_buffer}
+    ImportCache.add_vertices(arrays, vertices)
+
+    data = io.BytesIO()
+    np.savez(data, **arrays)
+    return data.getvalue()
+
+def unpack_geometry(data):
+    #(vertices, index buffer) of pack_geometry bytes, None when they can't be read
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as entry:
+            if int(entry["version"]) != cache_version:
+                return None
+            return ImportCache.read_vertices(entry), entry["index"]
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print("Packed geometry can't be read: " + str(e))
+        return None
@@ -0,0 +1,71 @@
+import os
+import time
+import bpy
+from bpy.props import BoolProperty, StringProperty, EnumProperty, CollectionProperty
+
+def get_import_filepaths(self):
+    #every file picked in the file browser, or just filepath when the operator is called from a script
+    files = getattr(self, "files", None)
+    if not files or not files[0].name:
+        return [self.filepath]
+    return [os.path.join(self.directory, file.name) for file in files]
+
+def print_import_time(filepath, start):
+    print("imported " + os.path.basename(filepath) + " in " + str(round(time.time() - start, 3)) + " seconds")
+
+class MultiFileImportOptions:
+    """Lets the file browser pick more than one file, see get_import_filepaths"""
+
+    files: CollectionProperty(
+        type=bpy.types.OperatorFileListElement,
+        options={'HIDDEN', 'SKIP_SAVE'},
+    )
+
+    directory: StringProperty(
+        subtype='DIR_PATH',
+        options={'HIDDEN', 'SKIP_SAVE'},
+    )
+
+class DrawableImportOptions:
+    """Options shared by every operator that builds drawables"""
+
+    stream_xml: BoolProperty(
+        name="Stream XML",
+        description="Build every geometry as soon as it is read instead of loading the whole file first, keeps memory low on large files",
+        default=False,
+    )
+
+    texture_paths: StringProperty(
+        name="Texture Folders",
+        description="Extra folders searched for textures that are not next to the file, separated by ;",
+        default="",
+    )
+
+    lod_levels: EnumProperty(
+        name="LOD Levels",
+        description="Levels of detail that get built, the geometry of the other levels is skipped",
+        options={'ENUM_FLAG'},
+        items=[("High", "High", "High"), ("Medium", "Medium", "Medium"), ("Low", "Low", "Low")],
+        default={"High", "Medium", "Low"},
+    )
+
+    lod_on_demand: BoolProperty(
+        name="Load LODs On Demand",
+        description="Medium and Low geometry is only built once that level is picked in the scene level of detail switcher",
+        default=False,
+    )
+
+    validate_meshes: BoolProperty(
+        name="Validate Meshes",
+        description="Check every mesh for invalid geometry and fix it, only needed for files that were not written by CodeWalker",
+        default=False,
+    )
+
+class ImportCacheOptions:
+    """Lets an operator keep decoded files in the import cache, see tools.importcache"""
+
+    use_cache: BoolProperty(
+        name="Use Import Cache",
+        description="Keep the decoded file in a cache folder so importing it again skips reading the xml",
+        default=False,
+    )
@@ -0,0 +1,141 @@
+import time
+import bpy
+from bpy.props import BoolProperty
+from bpy_extras.io_utils import ImportHelper
+
+class ImportProgress:
+    """Reports the stages of an import through the window manager and counts what got built"""
+
+    def __init__(self, window_manager=None):
+        self.window_manager = window_manager
+        self.stage = None
+        self.stage_start = 0
+        self.total = 0
+        self.done = 0
+        self.counters = {}
+        self.stage_times = []
+
+    def begin_stage(self, stage, total=0):
+        self.end_stage()
+
+        self.stage = stage
+        self.stage_start = time.time()
+        self.total = total
+        self.done = 0
+        print(stage + "...")
+
+        if self.window_manager != None:
+            self.window_manager.progress_begin(0, max(total, 1))
+
+    def end_stage(self):
+        if self.stage == None:
+            return
+
+        self.stage_times.append((self.stage, time.time() - self.stage_start))
+        self.stage = None
+
+        if self.window_manager != None:
+            self.window_manager.progress_end()
+
+    def step(self, amount=1):
+        self.done += amount
+        if self.window_manager != None:
+            # without a known total the bar just counts the steps
+            self.window_manager.progress_update(min(self.done, self.total) if self.total > 0 else self.done)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end(self):
+        self.end_stage()
+
+        for stage, seconds in self.stage_times:
+            print(stage + ": " + str(round(seconds, 3)) + " seconds")
+        for name, value in self.counters.items():
+            print(name + ": " + str(value))
+
+def count_import(operator, name, amount=1):
+    #operators not running through ModalImportHelper have nothing to count into
+    progress = getattr(operator, "progress", None)
+    if progress != None:
+        progress.count(name, amount)
+
+# only these reach the rest of the ui during a modal import, the view can be moved but nothing can be edited
+view_navigation_events = {
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+    'TRACKPADPAN', 'TRACKPADZOOM', 'NDOF_MOTION',
+}
+
+class ModalImportHelper(ImportHelper):
+    """ImportHelper that runs the import_steps(context) generator of the operator from a timer when started from
+    the file browser, so the ui shows progress and Esc cancels between two steps"""
+
+    modal_import: BoolProperty(
+        default=False,
+        options={'HIDDEN', 'SKIP_SAVE'},
+    )
+
+    def invoke(self, context, event):
+        self.modal_import = True
+        return super().invoke(context, event)
+
+    def execute(self, context):
+        window = context.window
+        self.progress = ImportProgress(context.window_manager if window != None else None)
+        self.steps = None
+
+        # scripts and background mode expect everything to be imported when the call returns
+        if not self.modal_import or window == None:
+            while self.next_step(context):
+                pass
+            self.progress.end()
+            return {'FINISHED'}
+
+        self.timer = context.window_manager.event_timer_add(0.001, window=window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def next_step(self, context):
+        #runs the import up to its next yield, False once it is done
+        #the context of this call is sent into the generator, the one of an earlier call can be stale by now
+        try:
+            if self.steps == None:
+                self.steps = self.import_steps(context)
+                next(self.steps)
+            else:
+                self.steps.send(context)
+        except StopIteration:
+            return False
+
+        return True
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            if self.steps != None:
+                self.steps.close()
+            self.stop_modal(context)
+            self.report({'WARNING'}, "Import cancelled")
+            return {'CANCELLED'}
+
+        if event.type in view_navigation_events:
+            return {'PASS_THROUGH'}
+
+        if event.type != 'TIMER':
+            # anything else could change the selection or the mode while the import is between two steps
+            return {'RUNNING_MODAL'}
+
+        try:
+            running = self.next_step(context)
+        except Exception:
+            self.stop_modal(context)
+            raise
+
+        if not running:
+            self.stop_modal(context)
+            return {'FINISHED'}
+
+        return {'RUNNING_MODAL'}
+
+    def stop_modal(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        self.progress.end()
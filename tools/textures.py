@@ -0,0 +1,70 @@
+import os
+import bpy
+
+class TextureResolver:
+    """Finds texture files by name in indexed folders and keeps every image it loaded"""
+
+    def __init__(self, search_paths=None):
+        self.folders = {}
+        self.images = {}
+        self.search_paths = []
+
+        if search_paths != None:
+            for path in search_paths:
+                self.add_search_path(path)
+
+    @staticmethod
+    def split_search_paths(text):
+        #search paths are typed in one field separated by ;
+        return [path.strip() for path in text.split(";") if path.strip()]
+
+    def add_search_path(self, path):
+        path = self.get_folder_key(path)
+        if path not in self.search_paths:
+            self.search_paths.append(path)
+
+    @staticmethod
+    def get_folder_key(path):
+        return os.path.normcase(os.path.abspath(os.path.expanduser(bpy.path.abspath(path))))
+
+    def get_folder_index(self, folder):
+        #every folder is listed once, lookups are then done by lowercase file name
+        folder = self.get_folder_key(folder)
+        index = self.folders.get(folder)
+        if index != None:
+            return index
+
+        index = {}
+        if os.path.isdir(folder):
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    index.setdefault(entry.name.lower(), entry.path)
+
+        self.folders[folder] = index
+        return index
+
+    def find(self, filename, folder=None):
+        name = filename.lower()
+
+        folders = self.search_paths
+        if folder != None:
+            folders = [folder] + folders
+
+        for path in folders:
+            filepath = self.get_folder_index(path).get(name)
+            if filepath != None:
+                return filepath
+
+        return None
+
+    def load(self, filename, folder=None):
+        filepath = self.find(filename, folder)
+        if filepath == None:
+            return None
+
+        image = self.images.get(filepath)
+        if image == None:
+            image = bpy.data.images.load(filepath, check_existing=True)
+            self.images[filepath] = image
+
+        return image
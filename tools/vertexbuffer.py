@@ -0,0 +1,122 @@
+import numpy as np
+
+# number of values and storage type of each vertex layout semantic in a Data2 line
+vertex_semantics = {
+    "Position": (3, np.float32),
+    "BlendWeights": (4, np.uint8),
+    "BlendIndices": (4, np.uint8),
+    "Normal": (3, np.float32),
+    "Colour0": (4, np.uint8),
+    "Colour1": (4, np.uint8),
+    "TexCoord0": (2, np.float32),
+    "TexCoord1": (2, np.float32),
+    "TexCoord2": (2, np.float32),
+    "TexCoord3": (2, np.float32),
+    "TexCoord4": (2, np.float32),
+    "TexCoord5": (2, np.float32),
+    "TexCoord6": (2, np.float32),
+    "TexCoord7": (2, np.float32),
+    "Tangent": (4, np.float32),
+    "Binormal": (4, np.float32),
+}
+
+class VertexBuffer:
+    """Vertex stream stored as one contiguous typed array per layout semantic"""
+
+    __slots__ = ("layout",) + tuple(vertex_semantics)
+
+    def __init__(self, layout=None):
+        self.layout = []
+        for semantic in vertex_semantics:
+            setattr(self, semantic, None)
+
+        if layout != None:
+            for semantic in layout:
+                if semantic not in vertex_semantics:
+                    raise TypeError("Unknown vertex layout element " + semantic)
+                self.layout.append(semantic)
+
+    def __len__(self):
+        if self.Position is None:
+            return 0
+        return len(self.Position)
+
+    def __contains__(self, semantic):
+        return self.get(semantic) is not None
+
+    def get(self, semantic):
+        if semantic not in vertex_semantics:
+            return None
+        return getattr(self, semantic)
+
+    def set(self, semantic, values):
+        size, dtype = vertex_semantics[semantic]
+        array = np.ascontiguousarray(values, dtype=dtype).reshape(-1, size)
+        setattr(self, semantic, array)
+
+        if semantic not in self.layout:
+            self.layout.append(semantic)
+
+    @staticmethod
+    def get_layout_plan(layout):
+        #column plan for a vertex layout: (semantic, first column, column count)
+        plan = []
+        stride = 0
+        for semantic in layout:
+            size = vertex_semantics[semantic][0]
+            plan.append((semantic, stride, size))
+            stride += size
+
+        return plan, stride
+
+    @classmethod
+    def from_text(cls, layout, data):
+        for semantic in layout:
+            if semantic not in vertex_semantics:
+                print("Unknown vertex layout element: " + semantic)
+                return None
+
+        buffer = cls(layout)
+        plan, stride = cls.get_layout_plan(buffer.layout)
+        if stride == 0:
+            return None
+
+        #every vertex line holds the same amount of numbers so the whole buffer can be parsed at once
+        values = np.fromstring(data, dtype=np.float32, sep=" ")
+        if values.size % stride != 0:
+            print("Incorrect layout data!")
+            return None
+
+        values = values.reshape(-1, stride)
+        for semantic, column, size in plan:
+            buffer.set(semantic, values[:, column:column + size])
+
+        return buffer
+
+    def iter_text(self, layout=None, chunk_rows=8192):
+        #the Data2 text in pieces of chunk_rows vertices, the layout is checked right away but
+        #nothing is formatted until the returned generator is iterated
+        if layout == None:
+            layout = self.layout
+
+        for semantic in layout:
+            if self.get(semantic) is None:
+                raise TypeError("Missing layout item " + semantic)
+
+        return self.format_chunks(layout, chunk_rows)
+
+    def format_chunks(self, layout, chunk_rows):
+        yield "\n"
+        if len(layout) == 0 or len(self) == 0:
+            return
+
+        arrays = [self.get(semantic) for semantic in layout]
+        line = " " * 5 + "".join(" ".join(["{}"] * array.shape[1]) + " " * 3 for array in arrays) + "\n"
+
+        # string arrays take 128 bytes per value, so only one chunk of them exists at a time
+        for start in range(0, len(self), chunk_rows):
+            rows = np.hstack([array[start:start + chunk_rows].astype(str) for array in arrays]).tolist()
+            yield "".join(line.format(*row) for row in rows)
+
+    def to_text(self, layout=None):
+        return "".join(self.iter_text(layout))
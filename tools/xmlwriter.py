@@ -0,0 +1,96 @@
+import os
+from contextlib import contextmanager
+
+def escape_text(text):
+    # vertex and index data never needs escaping, so it is written as it is without a copy
+    if "&" in text or "<" in text or ">" in text:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+def escape_attribute(value):
+    return escape_text(value).replace("\"", "&quot;")
+
+class ChunkedText:
+    """Element text that is only produced piece by piece while it gets written, for the large vertex buffers"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+class XmlWriter:
+    """Writes indented xml straight to a file, one element or one open tag at a time"""
+
+    def __init__(self, file, indent=" "):
+        self.file = file
+        self.indent = indent
+        self.depth = 0
+        file.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n")
+
+    @staticmethod
+    def get_attributes(attrib):
+        return "".join(" " + name + "=\"" + escape_attribute(value) + "\"" for name, value in attrib.items())
+
+    def start(self, tag, attrib=None):
+        #opens a tag whose children are written afterwards with element or start
+        attributes = self.get_attributes(attrib) if attrib != None else ""
+        self.file.write(self.indent * self.depth + "<" + tag + attributes + ">\n")
+        self.depth += 1
+
+    def end(self, tag):
+        self.depth -= 1
+        self.file.write(self.indent * self.depth + "</" + tag + ">\n")
+
+    def element(self, elem):
+        write = self.file.write
+        prefix = self.indent * self.depth
+        text = elem.text
+
+        write(prefix + "<" + elem.tag + self.get_attributes(elem.attrib))
+        if isinstance(text, ChunkedText):
+            write(">")
+            for chunk in text:
+                write(escape_text(chunk))
+            write("</" + elem.tag + ">\n")
+            return
+
+        if len(elem) == 0:
+            if not text:
+                write("/>\n")
+            else:
+                write(">")
+                write(escape_text(text))
+                write("</" + elem.tag + ">\n")
+            return
+
+        write(">")
+        if text and text.strip():
+            write(escape_text(text))
+        write("\n")
+
+        self.depth += 1
+        for child in elem:
+            self.element(child)
+        self.depth -= 1
+
+        write(prefix + "</" + elem.tag + ">\n")
+
+@contextmanager
+def open_replacing(filepath):
+    #the file is written next to filepath first and only replaces it once everything got written,
+    #an export that fails half way leaves the existing file as it was
+    temp_filepath = filepath + ".tmp"
+    try:
+        with open(temp_filepath, "w", encoding="utf-8") as f:
+            yield f
+    except BaseException:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+    os.replace(temp_filepath, filepath)
+
+def write_xml(elem, filepath):
+    with open_replacing(filepath) as f:
+        XmlWriter(f).element(elem)
@@ -3,14 +3,14 @@ from bpy_extras.io_utils import ExportHelper
 from bpy.types import Operator
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement, Comment, tostring
-from xml.dom import minidom
 from mathutils import Vector
 import os 
 import sys 
 import shutil
 import ntpath
 from datetime import datetime 
-from .ydrexport import get_obj_children, get_bbs, get_sphere_bb, prettify
+from .ydrexport import get_obj_children, get_bbs, get_sphere_bb
+from .tools.xmlwriter import write_xml
 
 def append_bbs(obj, node):
 #    children = get_obj_children(obj)
@@ -345,10 +345,8 @@ def write_ybn_xml(context, filepath):
 
     print("*** Complete ***")
     
-    xmlstr = prettify(root)
-    with open(filepath, "w") as f:
-        f.write(xmlstr)
-        return "Sollumz Drawable was succesfully exported to " + filepath
+    write_xml(root, filepath)
+    return "Sollumz Drawable was succesfully exported to " + filepath
             
 class ExportYBN(Operator, ExportHelper):
     """This appears in the tooltip of the operator and in the generated docs"""
@@ -8,6 +8,7 @@ from bpy_extras.io_utils import ImportHelper
 from bpy.props import StringProperty, BoolProperty, EnumProperty
 from bpy.types import Operator
 from datetime import datetime 
+import time
 import random 
 from math import cos
 from math import degrees
@@ -17,6 +18,7 @@ from math import sqrt
 
 from . import collisionmatoperators
 from .tools import meshgen as MeshGen
+from .tools.importoptions import MultiFileImportOptions, get_import_filepaths, print_import_time
 
 def get_all_vertices(vert_data):
     vertices = [] 
@@ -282,7 +284,7 @@ def create_poly_disc(discline, vertices, materials, geocenter):
     #obj.sollumtype = "Bound Disc"
     return None
 
-def read_box_info(bounds):
+def read_box_info(bounds, material_cache=None):
     
     mesh = bpy.data.meshes.new("Box")
     bm   = bmesh.new()
@@ -292,7 +294,7 @@ def read_box_info(bounds):
     bm.free()
     
     matindex = bounds.find("MaterialIndex").attrib["value"]
-    mat = collisionmatoperators.create_with_index(matindex, bpy.context) 
+    mat = get_collision_material(matindex, material_cache)
     mesh.materials.append(mat)
     
     obj = bpy.data.objects.new("Box", mesh)
@@ -301,7 +303,7 @@ def read_box_info(bounds):
     
     return obj
     
-def read_sphere_info(bounds):
+def read_sphere_info(bounds, material_cache=None):
     
     mesh = bpy.data.meshes.new("Sphere")
     bm   = bmesh.new()
@@ -311,7 +313,7 @@ def read_sphere_info(bounds):
     bm.free()
     
     matindex = bounds.find("MaterialIndex").attrib["value"]
-    mat = collisionmatoperators.create_with_index(matindex, bpy.context) 
+    mat = get_collision_material(matindex, material_cache)
     mesh.materials.append(mat)
     
     obj = bpy.data.objects.new("Sphere", mesh)
@@ -320,7 +322,7 @@ def read_sphere_info(bounds):
     
     return obj
 
-def read_capsule_info(bounds):
+def read_capsule_info(bounds, material_cache=None):
     
     mesh = bpy.data.meshes.new(name="Capsule")
     MeshGen.BoundCapsule(mesh, .01, .975)
@@ -333,7 +335,7 @@ def read_capsule_info(bounds):
     bm.free()
     
     matindex = bounds.find("MaterialIndex").attrib["value"]
-    mat = collisionmatoperators.create_with_index(matindex, bpy.context) 
+    mat = get_collision_material(matindex, material_cache)
     mesh.materials.append(mat)
     
     obj.sollumtype = "Bound Capsule"
@@ -341,7 +343,7 @@ def read_capsule_info(bounds):
     
     return obj
 
-def read_cylinder_info(bounds):
+def read_cylinder_info(bounds, material_cache=None):
     
     mesh = bpy.data.meshes.new("Cylinder")
     bm   = bmesh.new()
@@ -352,7 +354,7 @@ def read_cylinder_info(bounds):
     bm.free()
     
     matindex = bounds.find("MaterialIndex").attrib["value"]
-    mat = collisionmatoperators.create_with_index(matindex, bpy.context) 
+    mat = get_collision_material(matindex, material_cache)
     mesh.materials.append(mat)
     
     obj = bpy.data.objects.new("Cylinder", mesh)
@@ -361,7 +363,7 @@ def read_cylinder_info(bounds):
     
     return obj
 
-def read_disc_info(bounds):
+def read_disc_info(bounds, material_cache=None):
     mesh = bpy.data.meshes.new("Disc")
     radius = float(bounds.find("SphereRadius").attrib["value"])
     margin = float(bounds.find("Margin").attrib["value"])
@@ -369,7 +371,7 @@ def read_disc_info(bounds):
     MeshGen.BoundDisc(mesh=mesh, radius=radius, length=margin)
 
     matindex = bounds.find("MaterialIndex").attrib["value"]
-    mat = collisionmatoperators.create_with_index(matindex, bpy.context) 
+    mat = get_collision_material(matindex, material_cache)
     mesh.materials.append(mat)
     
     obj = bpy.data.objects.new("Disc", mesh)
@@ -384,22 +386,33 @@ def read_disc_info(bounds):
 def read_cloth_info(bounds):
     print("ERROR")
 
-def create_materials(emats):
+def get_collision_material(matindex, material_cache=None):
+    #files imported together use one material per collision type
+    if material_cache == None:
+        return collisionmatoperators.create_with_index(matindex, bpy.context)
+
+    mat = material_cache.get(matindex)
+    if mat == None:
+        mat = collisionmatoperators.create_with_index(matindex, bpy.context)
+        material_cache[matindex] = mat
+    return mat
+
+def create_materials(emats, material_cache=None):
     mats = []
     
     for emat in emats:
         matindex = str(emat.find("Type").attrib["value"])
-        mat = collisionmatoperators.create_with_index(matindex, bpy.context) 
+        mat = get_collision_material(matindex, material_cache)
         mats.append(mat)
         
     return mats
 
-def read_geometry_info(bounds, bvh=False):
+def read_geometry_info(bounds, bvh=False, material_cache=None):
 
     objectName = "GeometryBVH" if bvh else "Geometry"    
 
     #read materials
-    materials = create_materials(bounds.find("Materials"))   
+    materials = create_materials(bounds.find("Materials"), material_cache)   
     
     bobj = bpy.data.objects.new(objectName, None)
     
@@ -490,7 +503,7 @@ def read_geometry_info(bounds, bvh=False):
     bobj.bounds_bvh = bvh
     return bobj
 
-def read_composite_info(name, bounds):
+def read_composite_info(name, bounds, material_cache=None):
     
     cobj = bpy.data.objects.new(name + "_col", None)
         
@@ -505,19 +518,19 @@ def read_composite_info(name, bounds):
         childtype = child.attrib["type"]
         
         if(childtype == "GeometryBVH"):
-            children.append(read_geometry_info(child, True))
+            children.append(read_geometry_info(child, True, material_cache))
         if(childtype == "Geometry"):
-            children.append(read_geometry_info(child, False))
+            children.append(read_geometry_info(child, False, material_cache))
         if(childtype == "Box"):
-            children.append(read_box_info(child))
+            children.append(read_box_info(child, material_cache))
         if(childtype == "Sphere"):
-            children.append(read_sphere_info(child))
+            children.append(read_sphere_info(child, material_cache))
         if(childtype == "Capsule"):
-            children.append(read_capsule_info(child))
+            children.append(read_capsule_info(child, material_cache))
         if(childtype == "Cylinder"):
-            children.append(read_cylinder_info(child))
+            children.append(read_cylinder_info(child, material_cache))
         if(childtype == "Disc"):
-            children.append(read_disc_info(child))
+            children.append(read_disc_info(child, material_cache))
         if(childtype == "Cloth"):
             print()
             #children.append(read_cloth_info(child))
@@ -530,14 +543,14 @@ def read_composite_info(name, bounds):
 
     return cobj
     
-def read_bounds(name, bounds):
+def read_bounds(name, bounds, material_cache=None):
     
     type = bounds.attrib["type"]
     
     #bobjs = []
     
     if(type == "Composite"):
-        return read_composite_info(name, bounds)
+        return read_composite_info(name, bounds, material_cache)
         #bobjs.append(read_composite_info(name, bounds))
     else:
         print("ERROR UNKNOWN BOUND TYPE OF : " + type)
@@ -562,7 +575,7 @@ def read_bounds(name, bounds):
     
     #return bobjs
 
-def read_ybn_xml(context, filepath, root):
+def read_ybn_xml(context, filepath, root, material_cache=None):
     
     filename = os.path.basename(filepath[:-8]) 
     
@@ -571,11 +584,11 @@ def read_ybn_xml(context, filepath, root):
     if bound_node is None:
         return None
 
-    bound_obj = read_bounds(filename, bound_node)
+    bound_obj = read_bounds(filename, bound_node, material_cache)
     
     return bound_obj
     
-class ImportYbnXml(Operator, ImportHelper):
+class ImportYbnXml(Operator, ImportHelper, MultiFileImportOptions):
     """This appears in the tooltip of the operator and in the generated docs"""
     bl_idname = "importxml.ybn"  # important since its how bpy.ops.import_test.some_data is constructed
     bl_label = "Import Ybn"
@@ -584,15 +597,23 @@ class ImportYbnXml(Operator, ImportHelper):
     filename_ext = ".ybn.xml"
 
     def execute(self, context):
-        tree = ET.parse(self.filepath)
-        root = tree.getroot() 
-        
-        bound_obj = read_ybn_xml(context, self.filepath, root)
-        
-        if(bound_obj != None):
-            context.scene.collection.objects.link(bound_obj)
-        else:
-            self.report("Error importing ybn located at: " + self.filepath)
+        # collision materials are shared by every selected file
+        material_cache = {}
+
+        for filepath in get_import_filepaths(self):
+            start = time.time()
+
+            tree = ET.parse(filepath)
+            root = tree.getroot() 
+            
+            bound_obj = read_ybn_xml(context, filepath, root, material_cache)
+            
+            if(bound_obj != None):
+                context.scene.collection.objects.link(bound_obj)
+            else:
+                self.report({'ERROR'}, "Error importing ybn located at: " + filepath)
+
+            print_import_time(filepath, start)
             
         return {'FINISHED'}
     
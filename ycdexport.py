@@ -5,7 +5,7 @@ from bpy_extras.io_utils import ExportHelper
 from bpy.types import Operator
 
 from .formats.ycd.ClipDictionary import ClipDictionary
-from .ydrexport import prettify
+from .tools.xmlwriter import write_xml
 
 def findClipDictionary(context):
     objects = context.scene.objects
@@ -27,11 +27,8 @@ def write_ycd_xml(context, filepath):
 
     print("*** Complete ***")
 
-    xmlstr = prettify(clipDictNode)
-
-    with open(filepath, "w") as f:
-        f.write(xmlstr)
-        return "Sollumz Clip Dictionary was succesfully exported to " + filepath
+    write_xml(clipDictNode, filepath)
+    return "Sollumz Clip Dictionary was succesfully exported to " + filepath
 
 
 class ExportYcdXml(Operator, ExportHelper):
@@ -1,12 +1,12 @@
 import xml.etree.ElementTree as ET
 
 import bpy
-from bpy_extras.io_utils import ImportHelper
 from bpy.types import Operator
 
 from .formats.ycd.ClipDictionary import ClipDictionary
+from .tools.importprogress import ModalImportHelper
 
-class ImportYcdXml(Operator, ImportHelper):
+class ImportYcdXml(Operator, ModalImportHelper):
     """This appears in the tooltip of the operator and in the generated docs"""
     bl_idname = "importxml.ycd"  # important since its how bpy.ops.import_test.some_data is constructed
     bl_label = "Import Ycd"
@@ -14,17 +14,38 @@ class ImportYcdXml(Operator, ImportHelper):
     # ImportHelper mixin class uses this
     filename_ext = ".ycd.xml"
 
-    def execute(self, context):
+    def import_steps(self, context):
+        progress = self.progress
+
+        progress.begin_stage("Reading", 1)
         tree = ET.parse(self.filepath) # pylint: disable=no-member
         root = tree.getroot()
 
         clipDict = ClipDictionary.fromXml(root)
         print('Clip dictionary parsed')
-        clipDict.toObject()
+        progress.count("clips", len(clipDict.Clips))
+        progress.count("animations", len(clipDict.Animations))
+        progress.step()
+        yield
+
+        progress.begin_stage("Creating clips and animations", len(clipDict.Clips) + len(clipDict.Animations))
+        actions = set(bpy.data.actions)
+        dictNode = None
+        try:
+            for dictNode in clipDict.toObjectSteps():
+                progress.step()
+                yield
+        except GeneratorExit:
+            # cancelled, the half built dictionary and the actions of its animations are removed again
+            if dictNode != None:
+                for child in dictNode.children:
+                    bpy.data.objects.remove(child)
+                bpy.data.objects.remove(dictNode)
+            for action in set(bpy.data.actions) - actions:
+                bpy.data.actions.remove(action)
+            raise
         print('Clip dictionary import finished')
 
-        return {'FINISHED'}
-
 # Only needed if you want to add into a dynamic menu
 def menu_func_import_ycd(self, context):  # pylint: disable=unused-argument
     self.layout.operator(ImportYcdXml.bl_idname, text="Ycd (.ycd.xml)")
@@ -4,19 +4,24 @@ from bpy.types import Operator
 from bpy.props import StringProperty
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement, Comment, tostring
-from xml.dom import minidom
 from mathutils import Vector, Matrix
 import os 
+import io
 import sys 
 import shutil
 import ntpath
+import numpy as np
+import bmesh
 from datetime import datetime 
 from . import shaderoperators as Shader
+from .tools.vertexbuffer import VertexBuffer
+from .tools.xmlwriter import XmlWriter, ChunkedText, open_replacing, write_xml
+from .ydrimport import load_lod_placeholder
 
 def prettify(elem):
-    rough_string = tostring(elem, encoding='UTF-8')
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent=" ")
+    text = io.StringIO()
+    XmlWriter(text).element(elem)
+    return text.getvalue()
 
 def get_obj_children(obj):
     children = [] 
@@ -27,91 +32,87 @@ def get_obj_children(obj):
 
     return children 
 
-def order_vertex_list(list, vlayout):
-    layout_map = {
-        "Position": 0,
-        "Normal": 1,
-        "Colour0": 2,
-        "Colour1": 3,
-        "TexCoord0": 4,
-        "TexCoord1": 5,
-        "TexCoord2": 6,
-        "TexCoord3": 7,
-        "TexCoord4": 8,
-        "TexCoord5": 9,
-        "Tangent": 10,
-        "BlendWeights": 11,
-        "BlendIndices": 12,
-    }
-
-    newlist = []
-
-    for i in range(len(vlayout)):
-        layout_key = layout_map[vlayout[i]]
-        if layout_key != None:
-            if list[layout_key] == None:
-                raise TypeError("Missing layout item " + vlayout[i])
-
-            newlist.append(list[layout_key])
-        else:
-            print('Incorrect layout element', vlayout[i])
-
-    if (len(newlist) != len(vlayout)):
-        print('Incorrect layout parse')
-
-    return newlist
-
-def vector_tostring(vector):
-    try:
-        string = [str(vector.x), str(vector.y)]
-        if(hasattr(vector, "z")):
-            string.append(str(vector.z))
-
-        if(hasattr(vector, "w")):
-            string.append(str(vector.w))
-
-        return " ".join(string)
-    except:
-        return None
-
-def meshloopcolor_tostring(color):
-    try:
-        string = ""
-        string += str(round(color[0] * 255)) + " "
-        string += str(round(color[1] * 255)) + " "
-        string += str(round(color[2] * 255)) + " "
-        string += str(round(color[3] * 255))
-        return string 
-    except:
-        return None
-    
-def process_uv(uv):
-    u = uv[0]
-    v = (uv[1] - 1.0) * -1
-
-    return [u, v]
-
-def get_vertex_string(obj, vlayout, bones, depsgraph):
-    mesh = bpy.data.meshes.new_from_object(obj, preserve_all_data_layers=True, depsgraph=depsgraph)
-    # mesh = obj.to_mesh(preserve_all_data_layers=True, depsgraph=depsgraph)
-    # mesh = obj.data
-    
-    allstrings = []
-    allstrings.append("\n") #makes xml a little prettier
-    
-    vertamount = len(mesh.vertices)
-    vertices = [None] * vertamount
-    normals = [None] * vertamount
-    clr = [None] * vertamount
-    clr1 = [None] * vertamount
-    texcoords = {}
-    tangents = [None] * vertamount
-    blendw = [None] * vertamount
-    blendi = [None] * vertamount
-
-    for i in range(6):
-        texcoords[i] = [None] * vertamount       
-    
+def process_uv(uvs):
+    #flips v of a (n, 2) uv array
+    uvs[:, 1] = 1.0 - uvs[:, 1]
+    return uvs
+
+def get_data_array(data, attribute, size):
+    #one foreach_get of a loop or vertex attribute into a (len(data), size) float32 array
+    array = np.empty(len(data) * size, dtype=np.float32)
+    data.foreach_get(attribute, array)
+    return array.reshape(-1, size)
+
+def get_unique_vertices(records):
+    #splits loops into vertices: every distinct row of the (loops, n) record array becomes one vertex, in loop order
+    #returns the first loop of every vertex and the vertex of every loop
+    records = np.ascontiguousarray(records + np.float32(0)) # -0.0 and 0.0 are the same value
+    rows = records.view(np.dtype((np.void, records.dtype.itemsize * records.shape[1]))).ravel()
+    _, first_loops, loop_vertices = np.unique(rows, return_index=True, return_inverse=True)
+
+    order = np.argsort(first_loops)
+    vertex_of_unique = np.empty_like(order)
+    vertex_of_unique[order] = np.arange(len(order))
+
+    return first_loops[order], vertex_of_unique[loop_vertices.ravel()]
+
+def quantize_blend_weights(vertex_ids, bone_ids, weights, vertex_count):
+    #the 4 strongest influences of every vertex, strongest first, with weights adding up to exactly 255
+    #influences are flat arrays sorted by vertex
+    counts = np.bincount(vertex_ids, minlength=vertex_count)
+    size = max(int(counts.max(initial=0)), 4)
+    slots = np.arange(len(vertex_ids)) - (np.cumsum(counts) - counts)[vertex_ids]
+
+    # dense (vertices, size) table, padded with zero weights
+    table_weights = np.zeros((vertex_count, size), dtype=np.float64)
+    table_bones = np.zeros((vertex_count, size), dtype=np.int32)
+    table_weights[vertex_ids, slots] = weights
+    table_bones[vertex_ids, slots] = bone_ids
+
+    top = np.argpartition(-table_weights, 3, axis=1)[:, :4]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(table_weights, top, axis=1), axis=1, kind="stable"), axis=1)
+    top_weights = np.take_along_axis(table_weights, top, axis=1)
+    blendi = np.take_along_axis(table_bones, top, axis=1)
+    blendi[top_weights == 0] = 0
+
+    totals = top_weights.sum(axis=1)
+    scaled = top_weights * (255 / np.where(totals > 0, totals, 1))[:, None]
+    blendw = np.floor(scaled)
+
+    # what flooring lost goes one unit each to the largest fractions
+    remainders = 255 - blendw.sum(axis=1)
+    fraction_order = np.argsort(-(scaled - blendw), axis=1, kind="stable")
+    np.put_along_axis(blendw, fraction_order, np.take_along_axis(blendw, fraction_order, axis=1) + (np.arange(4) < remainders[:, None]), axis=1)
+
+    # vertices without any weight
+    blendw[totals == 0] = [0, 0, 255, 0]
+
+    return blendw.astype(np.float32), blendi.astype(np.float32)
+
+def get_blend_data(mesh, vertex_groups, bones_index_dict):
+    # bone of every vertex group, the extra last entry catches group indices past the end
+    group_bones = [bones_index_dict.get(group.name, -1) if group.lock_weight == False else -1 for group in vertex_groups]
+    group_bones = np.array(group_bones + [-1], dtype=np.int32)
+
+    #vertex groups have no foreach_get, this is the only loop over the vertices
+    vertex_ids = []
+    group_ids = []
+    weights = []
+    for vertex in mesh.vertices:
+        for element in vertex.groups:
+            vertex_ids.append(vertex.index)
+            group_ids.append(element.group)
+            weights.append(element.weight)
+
+    vertex_ids = np.array(vertex_ids, dtype=np.int64)
+    weights = np.array(weights, dtype=np.float64)
+    bone_ids = group_bones[np.minimum(np.array(group_ids, dtype=np.int64), len(group_bones) - 1)]
+
+    valid = (bone_ids >= 0) & (weights > 0)
+    return quantize_blend_weights(vertex_ids[valid], bone_ids[valid], weights[valid], len(mesh.vertices))
+
+def get_vertex_string(obj, mesh, vlayout, bones):
+    #returns the vertex buffer text and the exported vertex of every loop
     if mesh.has_custom_normals:
         mesh.calc_normals_split()
     else:
@@ -119,15 +120,13 @@ def get_vertex_string(obj, vlayout, bones, depsgraph):
 
     mesh.calc_tangents()
 
-    vertex_groups = obj.vertex_groups
-
     bones_index_dict = {}
     for i in range(len(bones)):
         bones_index_dict[bones[i].name] = i
 
     clr0_layer = None 
     clr1_layer = None
-    if(mesh.vertex_colors == None):
+    if(len(mesh.vertex_colors) == 0):
         clr0_layer = mesh.vertex_colors.new()
         clr1_layer = mesh.vertex_colors.new()
     else:
@@ -137,118 +136,66 @@ def get_vertex_string(obj, vlayout, bones, depsgraph):
         else:
             clr1_layer = mesh.vertex_colors.new()
 
-    for uv_layer_id in range(len(mesh.uv_layers)):
-        uv_layer = mesh.uv_layers[uv_layer_id].data
-        for poly in mesh.polygons:
-            for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-                vi = mesh.loops[loop_index].vertex_index
-                uv = process_uv(uv_layer[loop_index].uv)
-                u = uv[0]
-                v = uv[1]
-                fixed_uv = Vector((u, v))
-                texcoords[uv_layer_id][vi] = fixed_uv
-
-            
-    for poly in mesh.polygons:
-        for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-            vi = mesh.loops[loop_index].vertex_index
-            vertices[vi] = mesh.vertices[vi].co
-            # normals[vi] = mesh.vertices[vi].normal
-            normals[vi] = mesh.loops[loop_index].normal
-            clr[vi] = clr0_layer.data[loop_index].color
-            clr1[vi] = clr1_layer.data[loop_index].color
-            tangents[vi] = mesh.loops[loop_index].tangent.to_4d()
-            # https://github.com/labnation/MonoGame/blob/master/MonoGame.Framework.Content.Pipeline/Graphics/MeshHelper.cs#L298
-            # bitangent = bitangent_sign * cross(normal, tangent)
-            tangents[vi].w = mesh.loops[loop_index].bitangent_sign
-            #FIXME: one vert can only be influenced by 4 weights at most
-            vertex_group_elements = mesh.vertices[vi].groups
-
-            if len(vertex_group_elements) > 0:
-                blendw_list = []
-                blendi_list = []
-                valid_weights = 0
-                total_weights = 0
-                max_weights = 0
-                max_weights_position = -1
-
-                for element in vertex_group_elements:
-                    if element.group >= len(vertex_groups):
-                        continue
-
-                    vertex_group = vertex_groups[element.group]
-                    bone_index = bones_index_dict.get(vertex_group.name, -1)
-                    # 1/255 = 0.0039 the minimal weight for one vertex group
-                    weight = round(element.weight * 255)
-                    if (vertex_group.lock_weight == False and bone_index != -1 and weight > 0 and valid_weights < 4):
-                        blendw_list.append(weight)
-                        blendi_list.append(bone_index)
-                        if (max_weights < weight):
-                            max_weights_position = valid_weights
-                            max_weights = weight
-
-                        valid_weights += 1
-                        total_weights += weight
-
-                #fill the positions where there are no weights
-                if valid_weights < 4:
-                    for i in range(4 - valid_weights):
-                        blendw_list.append(0)
-                        blendi_list.append(0)
-
-                # weights verification stuff
-                # wtf rockstar
-                # why do you even use int for weights
-                if valid_weights > 0 and max_weights_position != -1:
-                    blendw_list[max_weights_position] = blendw_list[max_weights_position] + (255 - total_weights)
-
-                blendw[vi] = ' '.join(str(i) for i in blendw_list)
-                blendi[vi] = ' '.join(str(i) for i in blendi_list)
-            else:
-                blendw[vi] = "0 0 255 0"
-                blendi[vi] = "0 0 0 0"
-            
-    for i in range(len(vertices)):
-        vstring = ""
-        tlist = []
-        tlist.append(vector_tostring(vertices[i])) 
-        tlist.append(vector_tostring(normals[i])) 
-        tlist.append(meshloopcolor_tostring(clr[i])) 
-        tlist.append(meshloopcolor_tostring(clr1[i]))
-        tlist.append(vector_tostring(texcoords[0][i])) 
-        tlist.append(vector_tostring(texcoords[1][i]))
-        tlist.append(vector_tostring(texcoords[2][i]))
-        tlist.append(vector_tostring(texcoords[3][i]))
-        tlist.append(vector_tostring(texcoords[4][i]))
-        tlist.append(vector_tostring(texcoords[5][i]))
-        tlist.append(vector_tostring(tangents[i]))
-        tlist.append(blendw[i])
-        tlist.append(blendi[i])
-        
-        layoutlist = order_vertex_list(tlist, vlayout)
-        
-        vstring = " " * 5
-        for l in layoutlist:
-            vstring += l 
-            vstring += " " * 3
-        vstring += "\n" 
-        allstrings.append(vstring) 
-            
-    vertex_string = ""
-    for s in allstrings:       
-        vertex_string += s
-    
-    return vertex_string
-
-def get_index_string(mesh):
-    
-    index_string = ""
-    
-    for poly in mesh.polygons:
-        for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-            index_string += str(mesh.loops[loop_index].vertex_index) + " "
-            
-    return index_string
+    #everything is read per loop, loops with the same values in the layout then share one vertex
+    loop_vertex_indices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertex_indices)
+
+    # https://github.com/labnation/MonoGame/blob/master/MonoGame.Framework.Content.Pipeline/Graphics/MeshHelper.cs#L298
+    # bitangent = bitangent_sign * cross(normal, tangent)
+    tangents = np.hstack((get_data_array(mesh.loops, "tangent", 3), get_data_array(mesh.loops, "bitangent_sign", 1)))
+    blendw, blendi = get_blend_data(mesh, obj.vertex_groups, bones_index_dict)
+
+    loop_data = {}
+    loop_data["Position"] = get_data_array(mesh.vertices, "co", 3)[loop_vertex_indices]
+    loop_data["Normal"] = get_data_array(mesh.loops, "normal", 3)
+    loop_data["Colour0"] = np.rint(get_data_array(clr0_layer.data, "color", 4) * 255)
+    loop_data["Colour1"] = np.rint(get_data_array(clr1_layer.data, "color", 4) * 255)
+    for uv_layer_id in range(min(len(mesh.uv_layers), 6)):
+        loop_data["TexCoord" + str(uv_layer_id)] = process_uv(get_data_array(mesh.uv_layers[uv_layer_id].data, "uv", 2))
+    loop_data["Tangent"] = tangents
+    loop_data["BlendWeights"] = blendw[loop_vertex_indices]
+    loop_data["BlendIndices"] = blendi[loop_vertex_indices]
+
+    for semantic in vlayout:
+        if semantic not in loop_data:
+            raise TypeError("Missing layout item " + semantic)
+
+    # only what ends up in the file decides if two loops are the same vertex
+    records = np.hstack([loop_data[semantic] for semantic in vlayout])
+    first_loops, loop_vertices = get_unique_vertices(records)
+
+    buffer = VertexBuffer()
+    for semantic in vlayout:
+        buffer.set(semantic, loop_data[semantic][first_loops])
+
+    # formatted while the file is written, a big mesh never exists as one string
+    return ChunkedText(buffer.iter_text(vlayout)), loop_vertices
+
+def triangulate_ngons(mesh):
+    #tangents can only be calculated for tris and quads, so faces with more corners are split first
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    if len(loop_totals) == 0 or loop_totals.max() <= 4:
+        return
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bmesh.ops.triangulate(bm, faces=[face for face in bm.faces if len(face.verts) > 4])
+    bm.to_mesh(mesh)
+    bm.free()
+
+def get_index_text(indices, per_line=24):
+    #codewalker writes 24 indices per line
+    values = indices.astype(str)
+    lines = [" ".join(values[i:i + per_line]) for i in range(0, len(values), per_line)]
+    return "\n" + "".join(" " * 5 + line + "\n" for line in lines)
+
+def get_index_string(mesh, loop_vertices):
+    mesh.calc_loop_triangles()
+    triangle_loops = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", triangle_loops)
+
+    return get_index_text(loop_vertices[triangle_loops])
 
 def fix_shader_name(name, no_extension = False): #because blender renames everything to .00X
     newname = ""
@@ -343,18 +290,21 @@ def write_model_node(objs, materials, bones):
         
         if(shader.sollumtype != "GTA"):
             print("Error Material Type Is Not GTA!!")
+            bpy.data.meshes.remove(model)
             return m_node
         
         print('Processing shader', shader_index, shader.name)
         vlayout = get_vertex_layout(shader.name)
 
         data2_node = Element("Data2")
-        vertex_str = get_vertex_string(obj_eval, vlayout, bones, depsgraph)
+        triangulate_ngons(model)
+        vertex_str, loop_vertices = get_vertex_string(obj_eval, model, vlayout, bones)
         data2_node.text = vertex_str
         
         ib_node = Element("IndexBuffer")
         data_node = Element("Data")
-        data_node.text = get_index_string(model)
+        data_node.text = get_index_string(model, loop_vertices)
+        bpy.data.meshes.remove(model)
 
         ib_node.append(data_node)
         
@@ -393,6 +343,9 @@ def write_drawablemodels_node(models, materials, bones):
     low_models = []
     
     for obj in models:
+        # lods imported on demand need their geometry before they can be written
+        if not load_lod_placeholder(obj):
+            raise ValueError("Geometry of " + obj.name + " was imported on demand and can't be read, import the file again")
         if(obj.level_of_detail == "High"):
             high_models.append(obj)
         if(obj.level_of_detail == "Medium"):
@@ -1039,8 +992,8 @@ def write_drawable(obj, filepath, root_name="Drawable", bones=None):
     
     return drawable_node
     
-def write_drawable_dictionary(obj, filepath):
-    drawable_dictionary_node = Element("DrawableDictionary")
+def iter_drawable_dictionary(obj, filepath):
+    #yields the node of every drawable as soon as it is written
     children = get_obj_children(obj)
 
     bones = None
@@ -1051,8 +1004,12 @@ def write_drawable_dictionary(obj, filepath):
 
     for c in children:
         if c.sollumtype == "Drawable":
-            drawable_node = write_drawable(c, filepath, "Item", bones)
-            drawable_dictionary_node.append(drawable_node)
+            yield write_drawable(c, filepath, "Item", bones)
+
+def write_drawable_dictionary(obj, filepath):
+    drawable_dictionary_node = Element("DrawableDictionary")
+    for drawable_node in iter_drawable_dictionary(obj, filepath):
+        drawable_dictionary_node.append(drawable_node)
 
     return drawable_dictionary_node
 
@@ -1078,14 +1035,12 @@ def write_ydr_xml(context, filepath):
     if(root == None):
         return "No Sollumz Drawable found to export"
     
-    xmlstr = prettify(root)
-    with open(filepath, "w") as f:
-        f.write(xmlstr)
-        return "Sollumz Drawable was succesfully exported to " + filepath
+    write_xml(root, filepath)
+    return "Sollumz Drawable was succesfully exported to " + filepath
 
 def write_ydd_xml(context, filepath):
     
-    root = None
+    dictionary_obj = None
 
     objects = bpy.context.scene.collection.objects
 
@@ -1095,20 +1050,21 @@ def write_ydd_xml(context, filepath):
     #select the object first?
     for obj in objects:
         if(obj.sollumtype == "Drawable Dictionary"):
-            root = write_drawable_dictionary(obj, filepath)
-            try: 
-                print("*** Complete ***")
-            except:
-                print(str(Exception))
-                return str(Exception)
+            dictionary_obj = obj
 
-    if(root == None):
+    if(dictionary_obj == None):
         return "No Sollumz Drawable found to export"
     
-    xmlstr = prettify(root)
-    with open(filepath, "w") as f:
-        f.write(xmlstr)
-        return "Sollumz Drawable was succesfully exported to " + filepath
+    # every drawable goes to the file as soon as it is written, so only one is in memory at a time
+    with open_replacing(filepath) as f:
+        writer = XmlWriter(f)
+        writer.start("DrawableDictionary")
+        for drawable_node in iter_drawable_dictionary(dictionary_obj, filepath):
+            writer.element(drawable_node)
+        writer.end("DrawableDictionary")
+
+    print("*** Complete ***")
+    return "Sollumz Drawable was succesfully exported to " + filepath
 
 class ExportYDR(Operator, ExportHelper):
     """This appears in the tooltip of the operator and in the generated docs"""
@@ -7,168 +7,71 @@ from bpy.props import StringProperty, BoolProperty, EnumProperty
 from bpy.types import Operator
 import time
 import random 
-from .tools import cats as Cats
-from .ybnimport import read_ybn_xml 
-
-class v_vertex:
-
-    def __init__(self, p, tc, tc1, tc2, tc3, tc4, tc5, c, c1, n, t, bw, bi):
-        self.Position = p
-        self.TexCoord = tc
-        self.TexCoord1 = tc1
-        self.TexCoord2 = tc2
-        self.TexCoord3 = tc3
-        self.TexCoord4 = tc4
-        self.TexCoord5 = tc5
-        self.Color = c
-        self.Color1 = c1
-        self.Normal = n
-        self.Tangent = t
-        self.BlendWeights = bw
-        self.BlendIndices = bi
-
-def get_related_texture(texture_dictionary, img_name):
-
-    props = None 
-    format = None
-    usage = None 
-    not_half = False
-    hd_split = False
-    full = False
-    maps_half = False
-    
-    for t in texture_dictionary:
-        tname = t.find("FileName").text 
-        if(tname == img_name):
-            
-            format = t.find("Format").text.split("_")[1] 
-            usage = t.find("Usage").text
-            uf = t.find("UsageFlags").text
-            
-            not_half = False
-            hd_split = False    
-            full = False
-            maps_half = False
-            x2 = False
-            x4 = False
-            y4 = False
-            x8 = False
-            x16 = False 
-            x32 = False
-            x64 = False
-            y64 = False
-            x128 = False
-            x256 = False
-            x512 = False
-            y512 = False
-            x1024 = False
-            y1024 = False
-            x2048 = False
-            y2048 = False
-            embeddedscriptrt = False
-            unk19 = False
-            unk20 = False
-            unk21 = False
-            unk24 = False
-            
-            if("NOT_HALF" in uf):
-                not_half = True
-            if("HD_SPLIT" in uf):
-                hd_split = True
-            if("FLAG_FULL" in uf):
-                full = True
-            if("MAPS_HALF" in uf):
-                maps_half = True
-            if("X2" in uf):
-                x2 = True
-            if("X4" in uf):
-                x4 = True
-            if("Y4" in uf):
-                y4 = True
-            if("X8" in uf):
-                x8 = True
-            if("X16" in uf):
-                x16 = True
-            if("X32" in uf):
-                x32 = True
-            if("X64" in uf):
-                x64 = True
-            if("Y64" in uf):
-                y64 = True
-            if("X128" in uf):
-                x128 = True
-            if("X256" in uf):
-                x256 = True
-            if("X512" in uf):
-                x512 = True
-            if("Y512" in uf):
-                y512 = True
-            if("X1024" in uf):
-                x1024 = True
-            if("Y1024" in uf):
-                y1024 = True
-            if("X2048" in uf):
-                x2048 = True
-            if("Y2048" in uf):
-                y2048 = True
-            if("EMBEDDEDSCRIPTRT" in uf):
-                embeddedscriptrt = True
-            if("UNK19" in uf):
-                unk19 = True
-            if("UNK20" in uf):
-                unk20 = True
-            if("UNK21" in uf):
-                unk21 = True
-            if("UNK24" in uf):
-                unk24 = True
-            
-            
-            extra_flags = int(t.find("ExtraFlags").attrib["value"])
-            
-            props = []
-            props.append(format)
-            props.append(usage)
-            props.append(not_half) 
-            props.append(hd_split) 
-            props.append(full) 
-            props.append(maps_half) 
-            props.append(extra_flags)
-            props.append(x2)
-            props.append(x4)
-            props.append(y4)
-            props.append(x8)
-            props.append(x16)
-            props.append(x32)
-            props.append(x64)
-            props.append(y64)
-            props.append(x128)
-            props.append(x256)
-            props.append(x512)
-            props.append(y512)
-            props.append(x1024)
-            props.append(y1024)
-            props.append(x2048)
-            props.append(y2048)
-            props.append(embeddedscriptrt)
-            props.append(unk19)
-            props.append(unk20)
-            props.append(unk21)
-            props.append(unk24)
-        
-    return props 
+import multiprocessing
+from functools import partial
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .ybnimport import read_ybn_xml
+from .tools.vertexbuffer import VertexBuffer
+from .tools.textures import TextureResolver
+from .tools.importcache import ImportCache, pack_geometry, unpack_geometry
+from .tools.importprogress import ModalImportHelper, count_import
+from .tools.importoptions import DrawableImportOptions, ImportCacheOptions, MultiFileImportOptions, get_import_filepaths, print_import_time
+from .tools.drawableparse import read_geometry_buffers, iter_drawable_geometries, parse_drawable, split_dictionary_items
+
+# texture UsageFlags in bit order, the lowercase name is the matching image node property
+texture_usage_flags = [
+    "NOT_HALF", "HD_SPLIT", "FLAG_FULL", "MAPS_HALF",
+    "X2", "X4", "Y4", "X8", "X16", "X32", "X64", "Y64",
+    "X128", "X256", "X512", "Y512", "X1024", "Y1024", "X2048", "Y2048",
+    "EMBEDDEDSCRIPTRT", "UNK19", "UNK20", "UNK21", "UNK24",
+]
+texture_usage_flag_bits = {flag: 1 << i for i, flag in enumerate(texture_usage_flags)}
+
+def get_usage_flags(text):
+    flags = 0
+    if text != None:
+        for flag in text.split(","):
+            flags |= texture_usage_flag_bits.get(flag.strip(), 0)
+
+    return flags
+
+def read_texture_dictionary(td_node):
+    #lowercase filename -> (format, usage, usage flags bitset, extra flags)
+    #shader parameters don't always match the case of the FileName, same as the texture files on disk
+    texture_dictionary = {}
+    if(td_node == None):
+        return texture_dictionary
+
+    for t in td_node:
+        format = t.find("Format").text.split("_")[1]
+        usage = t.find("Usage").text
+        flags = get_usage_flags(t.find("UsageFlags").text)
+        extra_flags = int(t.find("ExtraFlags").attrib["value"])
+        texture_dictionary[t.find("FileName").text.lower()] = (format, usage, flags, extra_flags)
+
+    return texture_dictionary
+
+def set_texture_properties(node, texture):
+    format, usage, flags, extra_flags = texture
+
+    node.embedded = True
+    node.format_type = format
+    node.usage = usage
+    node.extra_flags = extra_flags
+    for flag in texture_usage_flags:
+        setattr(node, flag.lower(), (flags & texture_usage_flag_bits[flag]) != 0)
+
+def get_texture_folder(filepath):
+    #textures are extracted next to the xml in a folder named after it
+    filename = os.path.basename(filepath)[:-8]
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), filename)
 
-def create_material(filepath, td_node, shader):
+def create_material(filepath, texture_dictionary, shader, textures):
     
     params = shader.find("Parameters")
-    
-    filename = os.path.basename(filepath)[:-8]
-    texture_dir = os.path.dirname(os.path.abspath(filepath)) + "\\" + filename + "\\"
-    
-    texture_dictionary = None
-    if(td_node != None):
-        texture_dictionary = []
-        for i in td_node:
-            texture_dictionary.append(i)
+    texture_dir = get_texture_folder(filepath)
     
     shadern_node = shader.find("FileName")
     if shadern_node is not None:
@@ -187,10 +90,9 @@ def create_material(filepath, td_node, shader):
                     texture_pos = p.find("Name")
                     if(hasattr(texture_pos, 'text')):
                         texture_name = texture_pos.text + ".dds" 
-                        texture_path = texture_dir + texture_name
                         n.texture_name = texture_name
-                        if(os.path.isfile(texture_dir + texture_name)):
-                            img = bpy.data.images.load(texture_path, check_existing=True)
+                        img = textures.load(texture_name, texture_dir)
+                        if(img != None):
                             n.image = img 
 
                         #deal with special situations
@@ -208,279 +110,165 @@ def create_material(filepath, td_node, shader):
                     n.outputs[0].default_value = float(value)      
         
     #assign all embedded texture properties
-    #### FIND A BETTER WAY TO DO THIS ####
-    if(texture_dictionary != None):
-        for node in nodes:
-            if(isinstance(node, bpy.types.ShaderNodeTexImage)):
-                if(node.image != None):
-                    texturepath = node.image.filepath
-                    texturename = os.path.basename(texturepath)
-                    texture_properties = get_related_texture(texture_dictionary, texturename)
-                    if(texture_properties != None):
-                        node.embedded = True
-                        node.format_type = texture_properties[0] 
-                        node.usage = texture_properties[1]
-                        node.not_half = texture_properties[2] 
-                        node.hd_split = texture_properties[3] 
-                        node.flag_full = texture_properties[4] 
-                        node.maps_half = texture_properties[5]  
-                        node.extra_flags = texture_properties[6] 
-                        node.x2 = texture_properties[7] 
-                        node.x4 = texture_properties[8] 
-                        node.y4 = texture_properties[9] 
-                        node.x8 = texture_properties[10] 
-                        node.x16 = texture_properties[11] 
-                        node.x32 = texture_properties[12] 
-                        node.x64 = texture_properties[13] 
-                        node.y64 = texture_properties[14] 
-                        node.x128 = texture_properties[15] 
-                        node.x256 = texture_properties[16] 
-                        node.x512 = texture_properties[17] 
-                        node.y512 = texture_properties[18] 
-                        node.x1024 = texture_properties[19] 
-                        node.y1024 = texture_properties[20] 
-                        node.x2048 = texture_properties[21] 
-                        node.y2048 = texture_properties[22] 
-                        node.embeddedscriptrt = texture_properties[23] 
-                        node.unk19 = texture_properties[24] 
-                        node.unk20 = texture_properties[25]
-                        node.unk21 = texture_properties[26]
-                        node.unk24 = texture_properties[27]
+    for node in nodes:
+        if(isinstance(node, bpy.types.ShaderNodeTexImage) and node.image != None):
+            texture = texture_dictionary.get(node.texture_name.lower())
+            if(texture != None):
+                set_texture_properties(node, texture)
     
     mat.sollumtype = "GTA" 
     
     return mat
 
-def process_uv(uv):
-    u = uv[0]
-    v = (uv[1] * -1) + 1.0
-
-    return [u, v]
-
-def create_model(self, context, index_buffer, vertices, filepath, name, bones):
-
-    verts = []
-    faces = index_buffer
-    normals = []
-    texcoords = []
-    texcoords1 = []
-    texcoords2 = []
-    texcoords3 = []
-    texcoords4 = []
-    texcoords5 = []
-    tangents = []
-    vcolors = [] 
-    vcolors1 = [] 
-    blendweights = [] 
-    blendindices = [] 
-
-    for v in vertices:
-        if(v.Position != None):
-            verts.append(Vector((v.Position[0], v.Position[1], v.Position[2])))
+def process_uv(uvs):
+    #flip v for blender, works on a (N, 2) array of uvs
+    uvs = np.array(uvs, dtype=np.float32)
+    uvs[:, 1] = 1.0 - uvs[:, 1]
+
+    return uvs
+
+def create_vertex_groups(obj, bones, blendweights, blendindices):
+    vertex_count = len(blendweights)
+
+    #flatten the 4 influences of every vertex and drop the empty ones
+    vertex_ids = np.repeat(np.arange(vertex_count, dtype=np.int64), 4)
+    weights = blendweights.ravel().astype(np.int64)
+    indices = blendindices.ravel().astype(np.int64)
+    used = weights > 0
+    vertex_ids = vertex_ids[used]
+    weights = weights[used]
+    indices = indices[used]
+
+    if len(weights) == 0:
+        return
+
+    #a vertex can reference the same bone more than once, merge those influences
+    keys, inverse = np.unique(vertex_ids * 256 + indices, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), weights=weights).astype(np.int64)
+    vertex_ids = keys // 256
+    indices = keys % 256
+
+    #weights are bytes so every bone only has a handful of distinct weights, add each (bone, weight) bucket at once
+    buckets = indices * 1024 + weights
+    order = np.argsort(buckets, kind="stable")
+    buckets = buckets[order]
+    vertex_ids = vertex_ids[order]
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    ends = np.append(starts[1:], len(buckets))
+
+    #only the bones that are actually referenced get a group, in bone order
+    groups = {}
+    for bone_index in np.unique(indices).tolist():
+        if (bone_index < len(bones)):
+            groups[bone_index] = obj.vertex_groups.new(name=bones[bone_index])
         else:
-            return None #SHOULD NEVER HAPPEN
-        if(v.Normal != None):
-            normals.append(v.Normal)
-        if(v.TexCoord != None):
-            texcoords.append(v.TexCoord)
-        if(v.TexCoord1 != None):
-            texcoords1.append(v.TexCoord1)
-        if(v.TexCoord2 != None):
-            texcoords2.append(v.TexCoord2)
-        if(v.TexCoord3 != None):
-            texcoords3.append(v.TexCoord3)
-        if(v.TexCoord4 != None):
-            texcoords4.append(v.TexCoord4)
-        if(v.TexCoord5 != None):
-            texcoords5.append(v.TexCoord5)
-        if(v.Tangent != None):
-            tangents.append(Vector((v.Tangent[0], v.Tangent[1], v.Tangent[2])))
-        if(v.Color != None):
-            vcolors.append(v.Color)
-        if(v.Color1 != None):
-            vcolors1.append(v.Color1)
-        if(v.BlendWeights != None):
-            blendweights.append(v.BlendWeights)
-        if(v.BlendIndices != None):
-            blendindices.append(v.BlendIndices)
-        
-    #create mesh
+            groups[bone_index] = obj.vertex_groups.new(name="UNKNOWN_BONE." + str(bone_index))
+
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        bucket = int(buckets[start])
+        groups[bucket // 1024].add(vertex_ids[start:end].tolist(), (bucket % 1024) / 255, "ADD")
+
+def create_mesh(positions, triangles):
     mesh = bpy.data.meshes.new("Geometry")
-    mesh.from_pydata(verts, [], faces)
+
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set("co", positions.ravel())
+
+    mesh.loops.add(triangles.size)
+    mesh.loops.foreach_set("vertex_index", triangles.ravel().astype(np.int32))
+
+    mesh.polygons.add(len(triangles))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, triangles.size, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(triangles), 3, dtype=np.int32))
+
+    mesh.update(calc_edges=True)
+    return mesh
+
+def create_color_layer(mesh, name, colors, loop_vertex_indices):
+    #colors are the uint8 vertex colours of the file, expanded to one float rgba per loop
+    loop_colors = colors[loop_vertex_indices].astype(np.float32)
+    loop_colors /= 255
+
+    # color_srgb stores the file values unchanged, color on a color attribute would be linear
+    if hasattr(mesh, "color_attributes") and "color_srgb" in bpy.types.ByteColorAttributeValue.bl_rna.properties:
+        layer = mesh.color_attributes.new(name, 'BYTE_COLOR', 'CORNER')
+        layer.data.foreach_set("color_srgb", loop_colors.ravel())
+    else:
+        layer = mesh.vertex_colors.new(name=name)
+        layer.data.foreach_set("color", loop_colors.ravel())
+
+    return layer
+
+def create_model(self, context, index_buffer, vertices, filepath, name, bones, obj=None):
+
+    if vertices is None or "Position" not in vertices:
+        return None #SHOULD NEVER HAPPEN
+
+    verts = vertices["Position"]
+    normals = vertices.get("Normal")
+    texcoords = [vertices.get("TexCoord" + str(i)) for i in range(6)]
+    tangents = vertices.get("Tangent")
+    vcolors = vertices.get("Colour0")
+    vcolors1 = vertices.get("Colour1")
+    blendweights = vertices.get("BlendWeights")
+    blendindices = vertices.get("BlendIndices")
+
+    #create mesh
+    mesh = create_mesh(verts, index_buffer)
     verts_num = mesh.vertices
     mesh.create_normals_split()
-    mesh.validate(clean_customdata=False)
-    normals_fixed = []
-    for l in mesh.loops:
-        normals_fixed.append(normals[l.vertex_index])
-    
-    polygon_count = len(mesh.polygons)
-    mesh.polygons.foreach_set("use_smooth", [True] * polygon_count)
+    # codewalker output is trusted, validating is only needed for broken files
+    if getattr(self, "validate_meshes", False):
+        mesh.validate(clean_customdata=False)
 
-    mesh.normals_split_custom_set(normals_fixed)
+    #per vertex attributes are expanded to per loop through this
+    loop_vertex_indices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertex_indices)
+
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+
+    if normals is not None:
+        if len(normals) == len(mesh.vertices):
+            mesh.normals_split_custom_set_from_vertices(normals)
+        else:
+            mesh.normals_split_custom_set(normals[loop_vertex_indices])
     mesh.use_auto_smooth = True
 
     # set uv 
-    if(texcoords):
-        uv0 = mesh.uv_layers.new()
-        uv_layer0 = mesh.uv_layers[0]
-        for i in range(len(uv_layer0.data)):
-            uv = process_uv(texcoords[mesh.loops[i].vertex_index])
-            uv_layer0.data[i].uv = uv 
-    if(texcoords1):
-        uv1 = mesh.uv_layers.new()
-        uv_layer1 = mesh.uv_layers[1]
-        for i in range(len(uv_layer1.data)):
-            uv = process_uv(texcoords1[mesh.loops[i].vertex_index])
-            uv_layer1.data[i].uv = uv 
-    if(texcoords2):
-        uv2 = mesh.uv_layers.new()
-        uv_layer2 = mesh.uv_layers[2]
-        for i in range(len(uv_layer2.data)):
-            uv = process_uv(texcoords2[mesh.loops[i].vertex_index])
-            uv_layer2.data[i].uv = uv 
-    if(texcoords3):
-        uv3 = mesh.uv_layers.new()
-        uv_layer3 = mesh.uv_layers[3]
-        for i in range(len(uv_layer3.data)):
-            uv = process_uv(texcoords3[mesh.loops[i].vertex_index])
-            uv_layer3.data[i].uv = uv 
-    if(texcoords4):
-        uv4 = mesh.uv_layers.new()
-        uv_layer4 = mesh.uv_layers[4]
-        for i in range(len(uv_layer4.data)):
-            uv = process_uv(texcoords4[mesh.loops[i].vertex_index])
-            uv_layer4.data[i].uv = uv 
-    if(texcoords5):
-        uv5 = mesh.uv_layers.new()
-        uv_layer5 = mesh.uv_layers[5]
-        for i in range(len(uv_layer5.data)):
-            uv = process_uv(texcoords5[mesh.loops[i].vertex_index])
-            uv_layer5.data[i].uv = uv 
+    for uvs in texcoords:
+        if(uvs is not None):
+            uv_layer = mesh.uv_layers.new()
+            uv_layer.data.foreach_set("uv", process_uv(uvs)[loop_vertex_indices].ravel())
     
     #set vertex colors 
-    if(vcolors):
-        clr0 = mesh.vertex_colors.new(name = "Vertex Colors") 
-        color_layer = mesh.vertex_colors[0]
-        for i in range(len(color_layer.data)):
-            rgba = vcolors[mesh.loops[i].vertex_index]
-            color_layer.data[i].color = rgba
-    if(vcolors1):
-        clr1 = mesh.vertex_colors.new(name = "Vertex illumiation") 
-        color_layer1 = mesh.vertex_colors[1]
-        for i in range(len(color_layer.data)):
-            rgba = vcolors1[mesh.loops[i].vertex_index]
-            color_layer1.data[i].color = rgba
+    if(vcolors is not None):
+        create_color_layer(mesh, "Vertex Colors", vcolors, loop_vertex_indices)
+    if(vcolors1 is not None):
+        create_color_layer(mesh, "Vertex illumiation", vcolors1, loop_vertex_indices)
     
     #set tangents - .tangent is read only so can't set them
     #for poly in mesh.polygons:
         #for idx in poly.loop_indicies:
             #mesh.loops[i].tangent = tangents[i]    
 
-    obj = bpy.data.objects.new(name.replace(".#dr", "") + "_mesh", mesh)
+    if obj == None:
+        obj = bpy.data.objects.new(name.replace(".#dr", "") + "_mesh", mesh)
+    else:
+        #a lod placeholder getting its real mesh, materials stay on the placeholder's
+        for mat in obj.data.materials:
+            mesh.materials.append(mat)
+        placeholder_mesh = obj.data
+        obj.data = mesh
+        bpy.data.meshes.remove(placeholder_mesh)
     
     #load weights
-    # 256 - possibly the maximum of bones?
-    if (bones != None and len(bones) > 0 and len(blendweights) > 0 and len(verts_num) > 0):
-        for i in range(256):
-            if (i < len(bones)):
-                obj.vertex_groups.new(name=bones[i])
-            else:
-                obj.vertex_groups.new(name="UNKNOWN_BONE." + str(i))
-
-        for vertex_idx in range(len(verts_num)):
-            for i in range(0, 4):
-                if (blendweights[vertex_idx][i] > 0.0):
-                    obj.vertex_groups[blendindices[vertex_idx][i]].add([vertex_idx], blendweights[vertex_idx][i], "ADD")
-
-        Cats.remove_unused_vertex_groups_of_mesh(obj)
+    if (bones != None and len(bones) > 0 and blendweights is not None and blendindices is not None and len(verts_num) > 0):
+        create_vertex_groups(obj, bones, blendweights, blendindices)
 
     return obj
     #context.collection.objects.link(obj)
 
-def get_vertices_from_data(layout, v_buffer):
-    #find the position of the variable in the vertex layout
-    layers = []
-    for idx in range(len(layout)):
-        layers.append(layout[idx].tag)
-        
-    vertices = []
-    for v in v_buffer:
-        position = None
-        texcoords = None
-        texcoords1 = None
-        texcoords2 = None
-        texcoords3 = None
-        texcoords4 = None
-        texcoords5 = None
-        color = None
-        color1 = None
-        normal = None
-        tangents = None
-        blendw = None
-        blendi = None
-
-        tokens = v.split(" " * 3) #each vert value is split by 3 spaces
-
-        if len(tokens) != len(layers):
-            print("Incorrect layout data!")
-
-        for i in range(len(tokens)):
-            layer = layers[i]
-            token = tokens[i]
-
-            if layer == "Position":
-                position = list(map(lambda x: float(x), token.split()))
-            elif layer == "Normal":
-                normal = list(map(lambda x: float(x), token.split()))
-            elif layer == "Colour0":
-                color = list(map(lambda x: float(x) / 255, token.split()))
-            elif layer == "Colour1":
-                color1 = list(map(lambda x: float(x) / 255, token.split()))
-            elif layer == "TexCoord0":
-                texcoords = list(map(lambda x: float(x), token.split()))
-            elif layer == "TexCoord1":
-                texcoords1 = list(map(lambda x: float(x), token.split()))
-            elif layer == "TexCoord2":
-                texcoords2 = list(map(lambda x: float(x), token.split()))
-            elif layer == "TexCoord3":
-                texcoords3 = list(map(lambda x: float(x), token.split()))
-            elif layer == "TexCoord4":
-                texcoords4 = list(map(lambda x: float(x), token.split()))
-            elif layer == "TexCoord5":
-                texcoords5 = list(map(lambda x: float(x), token.split()))
-            elif layer == "Tangent":
-                tangents = list(map(lambda x: float(x), token.split()))
-            elif layer == "BlendWeights":
-                blendw = list(map(lambda x: float(x) / 255, token.split()))
-            elif layer == "BlendIndices":
-                blendi = list(map(lambda x: int(x), token.split()))
-
-        vertices.append(v_vertex(position, texcoords, texcoords1, texcoords2, texcoords3, texcoords4, texcoords5, color, color1, normal, tangents, blendw, blendi))
-
-    return vertices
-
-def read_model_info(self, context, filepath, model, shaders, name, bones):
-    
-    v_buffer = []
-    i_buffer = []
-    shader_index = 0
-
-    shader_index = int(model.find("ShaderIndex").attrib["value"])
-    vb = model.find("VertexBuffer")
-    v_buffer = map(lambda line : line.strip(), vb[2].text.strip().split("\n"))
-
-    ib = model.find("IndexBuffer")
-    i_buffer = ib[0].text.strip().replace("\n", "").split()
-
-    vertices = get_vertices_from_data(vb.find("Layout"), v_buffer)
-
-    i_buf = []
-    for num in i_buffer:
-        i_buf.append(int(num))
-
-    index_buffer = [i_buf[i * 3:(i + 1) * 3] for i in range((len(i_buf) + 3 - 1) // 3 )] #split index buffer into 3s for each triangle
-
+def get_model_bones(model, bones):
     # this is for the rare cases that model with no bone but have weights
     if (bones == None):
         boneids = model.find("BoneIDs")
@@ -490,21 +278,168 @@ def read_model_info(self, context, filepath, model, shaders, name, bones):
             for id in boneids:
                 bones.append("UNKNOWN_BONE." + id)
 
-    obj = create_model(self, context, index_buffer, vertices, filepath, name, bones) #supply shaderindex into texturepaths because the shaders are always in order
+    return bones
+
+def index_buffer_in_range(index_buffer, vertices):
+    # meshes aren't validated by default anymore, an index past the vertices would build a broken mesh
+    return index_buffer.size == 0 or index_buffer.max() < len(vertices)
+
+def read_model_info(self, context, filepath, model, shaders, name, bones, buffers=None, obj=None):
+    
+    shader_index = 0
+
+    shader_index = int(model.find("ShaderIndex").attrib["value"])
+
+    # buffers are already decoded when the file went through the parallel parse
+    if buffers == None:
+        buffers = read_geometry_buffers(model)
+    vertices, index_buffer = buffers
+
+    if vertices is not None and not index_buffer_in_range(index_buffer, vertices):
+        print("Skipping a geometry of " + name + ", its index buffer points past its vertices")
+        count_import(self, "geometries skipped")
+        return None
+
+    bones = get_model_bones(model, bones)
+
+    placeholder = obj
+    obj = create_model(self, context, index_buffer, vertices, filepath, name, bones, placeholder) #supply shaderindex into texturepaths because the shaders are always in order
+    if obj == None:
+        # the rest of the drawable still gets imported
+        print("Skipping a geometry of " + name + ", its vertex data can't be read")
+        count_import(self, "geometries skipped")
+        return None
+
+    count_import(self, "vertices decoded", len(vertices))
+    count_import(self, "meshes built")
     
-    obj.data.materials.append(shaders[shader_index])
+    if placeholder == None:
+        obj.data.materials.append(shaders[shader_index])
     return obj
 
-def read_shader_info(self, context, filepath, shd_node, td_node):
+def get_node_key(node):
+    children = tuple(get_node_key(child) for child in node)
+    return (node.tag, node.text.strip() if node.text else None, tuple(sorted(node.attrib.items())), children)
+
+def get_material_key(filepath, texture_dictionary, shader):
+    #identical shaders (same shader file, parameter values and textures) share one material
+    shadern_node = shader.find("FileName")
+    shadern = shadern_node.text if shadern_node is not None else "default.sps"
+    texture_dir = get_texture_folder(filepath)
+
+    params = []
+    texture_entries = []
+    for p in shader.find("Parameters"):
+        params.append(get_node_key(p))
+        texture_pos = p.find("Name")
+        if(hasattr(texture_pos, 'text') and texture_pos.text != None):
+            texture_entries.append(texture_dictionary.get((texture_pos.text + ".dds").lower()))
+
+    return (shadern, texture_dir, tuple(params), tuple(texture_entries))
+
+def get_texture_resolver(self):
+    texture_paths = getattr(self, "texture_paths", "")
+    return TextureResolver(TextureResolver.split_search_paths(texture_paths))
+
+def read_shader_info(self, context, filepath, shd_node, td_node, material_cache=None, textures=None):
     
     shaders = []
+    texture_dictionary = read_texture_dictionary(td_node)
+    if textures == None:
+        textures = get_texture_resolver(self)
     
     for shader in shd_node:
-        mat = create_material(filepath, td_node, shader)
+        if material_cache == None:
+            shaders.append(create_material(filepath, texture_dictionary, shader, textures))
+            count_import(self, "materials created")
+            continue
+
+        key = get_material_key(filepath, texture_dictionary, shader)
+        mat = material_cache.get(key)
+        if mat == None:
+            mat = create_material(filepath, texture_dictionary, shader, textures)
+            material_cache[key] = mat
+            count_import(self, "materials created")
         shaders.append(mat)
         
     return shaders
 
+def create_lod_placeholder(model, shaders, name, bones, buffers=None):
+    #an empty mesh object standing in for a lod geometry until that lod is shown
+    #the decoded geometry is packed into a property of the object, so the blend file owns it
+    if buffers == None:
+        buffers = read_geometry_buffers(model)
+    vertices, index_buffer = buffers
+    if vertices is None or "Position" not in vertices or not index_buffer_in_range(index_buffer, vertices):
+        return None
+
+    shader_index = int(model.find("ShaderIndex").attrib["value"])
+
+    mesh = bpy.data.meshes.new("Geometry")
+    mesh.materials.append(shaders[shader_index])
+    obj = bpy.data.objects.new(name.replace(".#dr", "") + "_mesh", mesh)
+    obj["sollumz_lod_geometry"] = pack_geometry(vertices, index_buffer)
+    set_lod_bones(obj, get_model_bones(model, bones))
+
+    return obj
+
+def set_lod_bones(obj, bones):
+    # bone names never hold a line break, so the list fits in one string property
+    if bones != None:
+        obj["sollumz_lod_bones"] = "\n".join(bones)
+    elif "sollumz_lod_bones" in obj:
+        del obj["sollumz_lod_bones"]
+
+def get_lod_bones(obj):
+    bones = obj.get("sollumz_lod_bones")
+    if bones == None:
+        return None
+    return bones.split("\n") if bones else []
+
+def load_lod_placeholder(obj):
+    #builds the real mesh of a lod placeholder, False when its geometry can't be read
+    data = obj.get("sollumz_lod_geometry")
+    if data == None:
+        return True
+
+    geometry = unpack_geometry(data)
+    if geometry == None:
+        print("Geometry of " + obj.name + " can't be read, import the file again to get it")
+        return False
+
+    vertices, index_buffer = geometry
+    if create_model(None, bpy.context, index_buffer, vertices, None, obj.name, get_lod_bones(obj), obj) == None:
+        return False
+
+    # the mesh holds the geometry now, the packed copy would only make the blend file bigger
+    del obj["sollumz_lod_geometry"]
+    if "sollumz_lod_bones" in obj:
+        del obj["sollumz_lod_bones"]
+    return True
+
+def load_scene_lods(scene, lod):
+    for obj in scene.objects:
+        if "sollumz_lod_geometry" in obj and (lod == "All" or obj.level_of_detail == lod):
+            load_lod_placeholder(obj)
+
+def read_geometry(self, context, filepath, model, shaders, name, bones, key, render_mask, buffers=None):
+    d_obj = None
+    if key != "High" and getattr(self, "lod_on_demand", False):
+        d_obj = create_lod_placeholder(model, shaders, name, bones, buffers)
+
+    # a geometry that can't be decoded gets reported and skipped by read_model_info
+    if d_obj == None:
+        d_obj = read_model_info(self, context, filepath, model, shaders, name, bones, buffers)
+        if d_obj == None:
+            return None
+    
+    #set sollum properties 
+    d_obj.sollumtype = "Geometry"
+    d_obj.level_of_detail = key
+    d_obj.mask = render_mask
+
+    return d_obj
+
 def read_drawable_models(self, context, filepath, root, name, shaders, key, bones):
 
     dm_node = root.find("DrawableModels" + key)
@@ -524,17 +459,10 @@ def read_drawable_models(self, context, filepath, root, name, shaders, key, bone
         for model in g_node:
             models.append(model)
         
-        idx = 0
         for model in models:
-            d_obj = read_model_info(self, context, filepath, model, shaders, name, bones)
-            
-            #set sollum properties 
-            d_obj.sollumtype = "Geometry"
-            d_obj.level_of_detail = key
-            d_obj.mask = render_mask
-            
-            drawable_objects.append(d_obj)
-            idx += 1
+            d_obj = read_geometry(self, context, filepath, model, shaders, name, bones, key, render_mask)
+            if d_obj != None:
+                drawable_objects.append(d_obj)
         
     return drawable_objects
 
@@ -548,7 +476,7 @@ def build_bones_dict(armature):
 
     return bones_dict
 
-def read_joints(self, context, filepath, root, bones_dict=None):
+def read_joints(self, context, filepath, root, bones_dict=None, armature=None):
 
     joints_node = root.find("Joints")
     if (joints_node == None):
@@ -558,7 +486,8 @@ def read_joints(self, context, filepath, root, bones_dict=None):
     if (rotationlimits_node == None):
         return None
 
-    armature = context.object
+    if (armature == None):
+        armature = context.object
     if (bones_dict == None):
         bones_dict = build_bones_dict(armature)
 
@@ -583,86 +512,100 @@ def read_joints(self, context, filepath, root, bones_dict=None):
 
     return rotationlimits
 
-def read_bones(self, context, filepath, root):
+def get_bone_matrices(parents, translations, rotations):
+    #world matrices of every bone from its local translation and (w, x, y, z) rotation, parents are indices or -1
+    w, x, y, z = (rotations / np.linalg.norm(rotations, axis=1)[:, None]).T
+
+    matrices = np.zeros((len(parents), 4, 4), dtype=np.float64)
+    matrices[:, 0] = np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y), translations[:, 0]), axis=1)
+    matrices[:, 1] = np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x), translations[:, 1]), axis=1)
+    matrices[:, 2] = np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y), translations[:, 2]), axis=1)
+    matrices[:, 3, 3] = 1
+
+    # depth of every bone in the hierarchy, then one batched multiply per depth level
+    depths = np.zeros(len(parents), dtype=np.int32)
+    ancestors = parents.copy()
+    while np.any(ancestors >= 0):
+        depths += ancestors >= 0
+        ancestors = np.where(ancestors >= 0, parents[ancestors], -1)
+
+    for depth in range(1, depths.max(initial=0) + 1):
+        level = np.nonzero(depths == depth)[0]
+        matrices[level] = matrices[parents[level]] @ matrices[level]
+
+    return matrices
+
+def read_bones(self, context, filepath, root, armature=None):
 
     skeleton_node = root.find("Skeleton")
     if (skeleton_node == None):
         return None, None
 
-    bones = []
+    names = []
     bones_tag = []
     flags_list = []
+    parents = []
+    translations = []
+    rotations = []
     # LimitRotation and Unk0 have their special meanings, can be deduced if needed when exporting
     flags_restricted = set(["LimitRotation", "Unk0"])
     drawable_name = root.find("Name").text.split(".")[0]
     bones_node = skeleton_node.find("Bones")
-    armature = context.object
-    bpy.ops.object.mode_set(mode='EDIT')
+    if (armature == None):
+        armature = context.object
 
     for bones_item in bones_node:
-        name_item = bones_item.find("Name")
-        tag_item = bones_item.find("Tag")
-        parentindex_item = bones_item.find("ParentIndex")
-        flags_item = bones_item.find("Flags")
         translation_item = bones_item.find("Translation")
         rotation_item = bones_item.find("Rotation")
-        scale_item = bones_item.find("Scale")
-
-        quaternion = Quaternion()
-        quaternion.w = float(rotation_item.attrib["w"])
-        quaternion.x = float(rotation_item.attrib["x"])
-        quaternion.y = float(rotation_item.attrib["y"])
-        quaternion.z = float(rotation_item.attrib["z"])
-        mat_rot = quaternion.to_matrix().to_4x4()
-
-        trans = Vector()
-        trans.x = float(translation_item.attrib["x"])
-        trans.y = float(translation_item.attrib["y"])
-        trans.z = float(translation_item.attrib["z"])
-        mat_loc = Matrix.Translation(trans)
-
-        scale = Vector()
-        scale.x = float(scale_item.attrib["x"])
-        scale.y = float(scale_item.attrib["y"])
-        scale.z = float(scale_item.attrib["z"])
-        mat_sca = Matrix.Scale(1, 4, scale)
-
-        edit_bone = armature.data.edit_bones.new(name_item.text)
-        # edit_bone.bone_id = int(bone_tag.attrib["value"])
-        if parentindex_item.attrib["value"] != "-1":
-            edit_bone.parent = armature.data.edit_bones[int(parentindex_item.attrib["value"])]
-
-        # https://github.com/LendoK/Blender_GTA_V_model_importer/blob/master/importer.py
-        edit_bone.head = (0,0,0)
-        edit_bone.tail = (0,0.05,0)
-        edit_bone.matrix = mat_loc @ mat_rot @ mat_sca
-        if edit_bone.parent != None:
-            edit_bone.matrix = edit_bone.parent.matrix @ edit_bone.matrix
+        flags_item = bones_item.find("Flags")
 
+        # scale is not applied, edit bones can't hold it
+        translations.append([float(translation_item.attrib[axis]) for axis in "xyz"])
+        rotations.append([float(rotation_item.attrib[axis]) for axis in "wxyz"])
+        parents.append(int(bones_item.find("ParentIndex").attrib["value"]))
+
+        flags = []
         if (flags_item != None and flags_item.text != None):
-            flags = flags_item.text.strip().split(", ")
-            
+            flags = [flag for flag in flags_item.text.strip().split(", ") if flag not in flags_restricted]
         flags_list.append(flags)
 
-        # build a bones lookup table
-        bones.append(name_item.text)
-        bones_tag.append(int(tag_item.get('value')))
+        names.append(bones_item.find("Name").text)
+        bones_tag.append(int(bones_item.find("Tag").get('value')))
+
+    matrices = get_bone_matrices(np.array(parents, dtype=np.int64), np.array(translations).reshape(-1, 3), np.array(rotations).reshape(-1, 4))
+
+    # https://github.com/LendoK/Blender_GTA_V_model_importer/blob/master/importer.py
+    # mode_set works on the active object, which can have changed since the armature was created
+    context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    edit_bones = []
+    for i in range(len(names)):
+        edit_bone = armature.data.edit_bones.new(names[i])
+        if parents[i] >= 0:
+            edit_bone.parent = edit_bones[parents[i]]
+
+        edit_bone.head = (0,0,0)
+        edit_bone.tail = (0,0.05,0)
+        edit_bone.matrix = Matrix(matrices[i].tolist())
+        edit_bones.append(edit_bone)
+
+    # names can get a suffix when the armature already has a bone with that name
+    bones = [edit_bone.name for edit_bone in edit_bones]
 
-    bpy.ops.object.mode_set(mode='POSE')
+    bpy.ops.object.mode_set(mode='OBJECT')
 
+    # tags and flags live on the bones, so they don't need pose mode
     for i in range(len(bones)):
-        armature.pose.bones[i].bone.bone_properties.tag = bones_tag[i]
+        bone = armature.data.bones[bones[i]]
+        bone.bone_properties.tag = bones_tag[i]
         for _flag in flags_list[i]:
-            if (_flag in flags_restricted):
-                continue
-
-            flag = armature.pose.bones[i].bone.bone_properties.flags.add()
+            flag = bone.bone_properties.flags.add()
             flag.name = _flag
 
-    bpy.ops.object.mode_set(mode='OBJECT')
     return bones, drawable_name
 
-def read_ydr_shaders(self, context, filepath, root):
+def read_ydr_shaders(self, context, filepath, root, material_cache=None, textures=None):
     shd_group = root.find("ShaderGroup")
 
     if not shd_group:
@@ -671,11 +614,10 @@ def read_ydr_shaders(self, context, filepath, root):
     shd_node = shd_group.find("Shaders")
     td_node = shd_group.find("TextureDictionary")  
 
-    shaders = read_shader_info(self, context, filepath, shd_node, td_node)
+    shaders = read_shader_info(self, context, filepath, shd_node, td_node, material_cache, textures)
     return shaders
 
-def read_ydr_xml(self, context, filepath, root, shaders, bones=None):
-
+def get_drawable_name(filepath, root):
     fname = os.path.basename(filepath)
     name = fname[:-8] #removes file extension
 
@@ -684,23 +626,38 @@ def read_ydr_xml(self, context, filepath, root, shaders, bones=None):
     if model_name == None:
         model_name = name
 
+    return model_name
+
+def read_drawable_skeleton(self, context, filepath, root, bones=None, armature=None):
     # ydd specific, if bones are found then don't do that all over again
     if (bones == None):
-        bones = read_bones(self, context, filepath, root)[0]
+        bones = read_bones(self, context, filepath, root, armature)[0]
 
     if (bones != None):
-        joints = read_joints(self, context, filepath, root)
+        joints = read_joints(self, context, filepath, root, armature=armature)
+
+    return bones
+
+def import_lod(self, key):
+    #operators without the lod_levels option import every level
+    lods = getattr(self, "lod_levels", None)
+    return lods == None or key in lods
+
+def read_ydr_xml(self, context, filepath, root, shaders, bones=None):
+
+    model_name = get_drawable_name(filepath, root)
+    bones = read_drawable_skeleton(self, context, filepath, root, bones)
 
     #get objects from drawable info
     high_objects = []
     med_objects = []
     low_objects = []
     
-    if(root.find("DrawableModelsHigh") != None):
+    if(import_lod(self, "High") and root.find("DrawableModelsHigh") != None):
         high_objects = read_drawable_models(self, context, filepath, root, model_name, shaders, "High", bones)
-    if(root.find("DrawableModelsMedium") != None):
+    if(import_lod(self, "Medium") and root.find("DrawableModelsMedium") != None):
         med_objects = read_drawable_models(self, context, filepath, root, model_name, shaders, "Medium", bones)
-    if(root.find("DrawableModelsLow") != None):
+    if(import_lod(self, "Low") and root.find("DrawableModelsLow") != None):
         low_objects = read_drawable_models(self, context, filepath, root, model_name, shaders, "Low", bones)
 
     all_objects = []
@@ -724,14 +681,281 @@ def read_ydd_xml(self, context, filepath, root):
         if (drawable_with_bones_name != None):
             break
 
+    # drawables of a dictionary often use the same shaders, those only get created once
+    material_cache = {}
+    textures = get_texture_resolver(self)
     for ydr in root:
-        shaders = read_ydr_shaders(self, context, filepath, ydr)
+        shaders = read_ydr_shaders(self, context, filepath, ydr, material_cache, textures)
         allobjs = read_ydr_xml(self, context, filepath, ydr, shaders, bones)
         all_objects.append(allobjs)
 
     return all_objects, drawable_with_bones_name
 
-class ImportYDR(Operator, ImportHelper):
+def iter_xml_streamed(parser):
+    #yields (drawable, key, model, geometry) for every DrawableModels*/Item/Geometries/Item of an iterparse parser
+    #as soon as it is closed, the element is then dropped so only one geometry is held in memory at a time
+    parents = []
+
+    for event, elem in parser:
+        if event == "start":
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if (elem.tag == "Item" and len(parents) >= 4 and parents[-1].tag == "Geometries" and parents[-3].tag.startswith("DrawableModels")):
+            drawable = parents[-4]
+            key = parents[-3].tag[len("DrawableModels"):]
+            yield drawable, key, parents[-2], elem
+            parents[-1].remove(elem)
+
+class DrawableStreamReader:
+    """Builds the geometries of every drawable in a file while it is still being parsed"""
+
+    def __init__(self, operator, context, filepath, share_bones=False, share_shaders=False, material_cache=None, textures=None, armature=None):
+        self.operator = operator
+        self.context = context
+        self.armature = armature
+        self.filepath = filepath
+        self.share_bones = share_bones
+        self.share_shaders = share_shaders
+        self.bones = None
+        self.bones_drawable_name = None
+        self.shaders = None
+        self.material_cache = material_cache if material_cache != None else {}
+        self.textures = textures if textures != None else get_texture_resolver(operator)
+        self.drawables = {}
+        # (object, bones from its BoneIDs, blend weights, blend indices) of geometries read before the shared skeleton
+        self.unnamed_bone_objects = []
+        self.skeleton_read = False
+        self.root = None
+
+    def read_steps(self):
+        #streams the file, yielding after every geometry
+        parser = ET.iterparse(self.filepath, events=("start", "end"))
+        for drawable, key, model, geometry in iter_xml_streamed(parser):
+            self.read_geometry(drawable, key, model, geometry)
+            yield
+        self.root = parser.root
+
+        self.skeleton_read = True
+        self.add_unnamed_bone_groups()
+
+    def add_unnamed_bone_groups(self):
+        # the same groups read_ydr_xml gives them, blend index i is bone i of the shared skeleton
+        for obj, model_bones, blendweights, blendindices in self.unnamed_bone_objects:
+            bones = self.bones if self.bones != None else model_bones
+            if "sollumz_lod_geometry" in obj:
+                # lod placeholders get their groups from these bones once the lod is shown
+                set_lod_bones(obj, bones)
+                continue
+            if (bones == None or len(bones) == 0 or blendweights is None or blendindices is None or len(blendweights) == 0):
+                continue
+            create_vertex_groups(obj, bones, blendweights, blendindices)
+        self.unnamed_bone_objects = []
+
+    def read(self):
+        for step in self.read_steps():
+            pass
+
+        return self.root
+
+    def get_drawable(self, drawable):
+        info = self.drawables.get(drawable)
+        if info != None:
+            return info
+
+        shaders = None
+        if not self.share_shaders or self.shaders == None:
+            shaders = read_ydr_shaders(self.operator, self.context, self.filepath, drawable, self.material_cache, self.textures)
+        if shaders == None:
+            shaders = self.shaders
+        elif self.shaders == None:
+            self.shaders = shaders
+
+        if (self.share_bones and self.bones != None):
+            bones = read_drawable_skeleton(self.operator, self.context, self.filepath, drawable, self.bones, self.armature)
+        else:
+            bones = read_drawable_skeleton(self.operator, self.context, self.filepath, drawable, armature=self.armature)
+            if (self.share_bones and bones != None):
+                self.bones = bones
+                self.bones_drawable_name = drawable.find("Name").text.split(".")[0]
+
+        info = (get_drawable_name(self.filepath, drawable), shaders, bones, [])
+        self.drawables[drawable] = info
+        return info
+
+    def read_geometry(self, drawable, key, model, geometry, buffers=None):
+        name, shaders, bones, objects = self.get_drawable(drawable)
+        if not import_lod(self.operator, key):
+            return
+
+        render_mask = int(model.find("RenderMask").attrib["value"])
+
+        # a skeleton further down the file is shared by this geometry too, its vertex groups wait for it
+        wait_for_bones = self.share_bones and bones == None and not self.skeleton_read
+        if wait_for_bones:
+            if buffers == None:
+                buffers = read_geometry_buffers(geometry)
+            model_bones = get_model_bones(geometry, None)
+            bones = []
+
+        obj = read_geometry(self.operator, self.context, self.filepath, geometry, shaders, name, bones, key, render_mask, buffers)
+        if obj == None:
+            return
+        objects.append(obj)
+
+        if wait_for_bones and buffers[0] is not None:
+            self.unnamed_bone_objects.append((obj, model_bones, buffers[0].get("BlendWeights"), buffers[0].get("BlendIndices")))
+
+    def remove_objects(self):
+        #removes every geometry built so far, lod placeholders take their packed geometry with them
+        for name, shaders, bones, objects in self.drawables.values():
+            for obj in objects:
+                mesh = obj.data
+                bpy.data.objects.remove(obj)
+                bpy.data.meshes.remove(mesh)
+
+        self.drawables = {}
+        self.unnamed_bone_objects = []
+
+    def get_objects(self, drawable):
+        return self.get_drawable(drawable)[3]
+
+    def read_parsed(self, drawable, buffers=None):
+        #builds a drawable whose buffers were decoded by parse_drawable, or that still holds its buffer text
+        for i, (key, model, geometry) in enumerate(iter_drawable_geometries(drawable)):
+            self.read_geometry(drawable, key, model, geometry, buffers[i] if buffers != None else None)
+
+    def read_skeleton(self, root):
+        # we need the drawable that holds the bones before building the others
+        for drawable in root:
+            if (drawable.find("Skeleton") != None):
+                self.get_drawable(drawable)
+                break
+        self.skeleton_read = True
+
+# the workers can't import the addon package itself since that needs bpy, so it is stubbed
+# there and only the bpy free modules of tools are loaded from disk
+parse_worker_init = """
+import sys, types
+for name, path in packages:
+    if name not in sys.modules:
+        module = types.ModuleType(name)
+        module.__path__ = [path]
+        sys.modules[name] = module
+"""
+
+def get_parse_worker_packages():
+    package = __name__.rpartition(".")[0]
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    return [(package, package_dir), (package + ".tools", os.path.join(package_dir, "tools"))]
+
+def parse_items_parallel(items, lods=None):
+    #decodes xml items with parse_drawable in a process pool, results are in the order of the items
+    if len(items) == 0:
+        return []
+
+    mp_context = multiprocessing.get_context("spawn")
+    # before 2.91 sys.executable is blender itself
+    python = getattr(bpy.app, "binary_path_python", None)
+    if python:
+        mp_context.set_executable(python)
+
+    parse = partial(parse_drawable, lods=lods)
+    workers = min(len(items), os.cpu_count() or 1)
+    initargs = (parse_worker_init, {"packages": get_parse_worker_packages()})
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=exec, initargs=initargs) as pool:
+            return list(pool.map(parse, items))
+    except (OSError, BrokenProcessPool) as e:
+        print("Parallel parse failed, parsing on the main thread: " + str(e))
+        return [parse(item) for item in items]
+
+def get_import_cache(self):
+    if not getattr(self, "use_cache", False):
+        return None
+    return ImportCache()
+
+def parse_drawable_file(self, filepath, dictionary=False):
+    #(drawable, buffers) of every drawable in a ydr or ydd file, taken from the import cache when it is still valid
+    cache = get_import_cache(self)
+    if cache != None:
+        parsed = cache.load(filepath)
+        if parsed != None:
+            return parsed
+
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    # cached files keep every lod, the skipped ones are left out when building
+    lods = None
+    if cache == None:
+        lods = getattr(self, "lod_levels", None)
+
+    if dictionary:
+        items = [data[start:end] for start, end in split_dictionary_items(data)]
+        if getattr(self, "parallel_parse", False):
+            parsed = parse_items_parallel(items, lods)
+        else:
+            parsed = [parse_drawable(item, lods) for item in items]
+    else:
+        parsed = [parse_drawable(data, lods)]
+
+    if cache != None:
+        cache.save(filepath, data, parsed)
+
+    return parsed
+
+def import_ydr(self, context, filepath, material_cache, textures, collision_materials):
+    name = os.path.basename(filepath)[:-8]
+    armature = bpy.data.armatures.new(name + ".skel")
+    vmodel_obj = bpy.data.objects.new(name, armature)
+    context.scene.collection.objects.link(vmodel_obj)
+    context.view_layer.objects.active = vmodel_obj
+
+    if self.use_cache:
+        root, buffers = parse_drawable_file(self, filepath)[0]
+        reader = DrawableStreamReader(self, context, filepath, material_cache=material_cache, textures=textures)
+        reader.read_parsed(root, buffers)
+        ydr_objs = reader.get_objects(root)
+    elif self.stream_xml:
+        reader = DrawableStreamReader(self, context, filepath, material_cache=material_cache, textures=textures)
+        root = reader.read()
+        ydr_objs = reader.get_objects(root)
+    else:
+        tree = ET.parse(filepath)
+        root = tree.getroot()
+
+        shaders = read_ydr_shaders(self, context, filepath, root, material_cache, textures)
+        ydr_objs = read_ydr_xml(self, context, filepath, root, shaders)
+
+    for obj in ydr_objs:
+        context.scene.collection.objects.link(obj)
+        obj.parent = vmodel_obj
+        mod = obj.modifiers.new("Armature", 'ARMATURE')
+        mod.object = vmodel_obj
+    
+    bound_obj = read_ybn_xml(context, filepath, root, collision_materials)
+    
+    if bound_obj is not None:
+        bound_obj.parent = vmodel_obj
+        context.scene.collection.objects.link(bound_obj)
+    
+    #set sollum properties 
+    dd_high = float(root.find("LodDistHigh").attrib["value"])
+    dd_med = float(root.find("LodDistMed").attrib["value"])
+    dd_low = float(root.find("LodDistLow").attrib["value"])
+    dd_vlow = float(root.find("LodDistVlow").attrib["value"])
+    
+    vmodel_obj.sollumtype = "Drawable"
+    vmodel_obj.drawble_distance_high = dd_high 
+    vmodel_obj.drawble_distance_medium = dd_med
+    vmodel_obj.drawble_distance_low = dd_low
+    vmodel_obj.drawble_distance_vlow = dd_vlow
+
+    return vmodel_obj
+
+class ImportYDR(Operator, ImportHelper, DrawableImportOptions, ImportCacheOptions, MultiFileImportOptions):
     """This appears in the tooltip of the operator and in the generated docs"""
     bl_idname = "importxml.ydr"  # important since its how bpy.ops.import_test.some_data is constructed
     bl_label = "Import Ydr"
@@ -747,42 +971,16 @@ class ImportYDR(Operator, ImportHelper):
 
     def execute(self, context):
         start = time.time()
-        
-        tree = ET.parse(self.filepath)
-        root = tree.getroot()
 
-        name = os.path.basename(self.filepath)[:-8]
-        armature = bpy.data.armatures.new(name + ".skel")
-        vmodel_obj = bpy.data.objects.new(name, armature)
-        context.scene.collection.objects.link(vmodel_obj)
-        context.view_layer.objects.active = vmodel_obj
+        # materials, images and collision materials are shared by every selected file
+        material_cache = {}
+        textures = get_texture_resolver(self)
+        collision_materials = {}
 
-        shaders = read_ydr_shaders(self, context, self.filepath, root)
-        ydr_objs = read_ydr_xml(self, context, self.filepath, root, shaders)
-
-        for obj in ydr_objs:
-            context.scene.collection.objects.link(obj)
-            obj.parent = vmodel_obj
-            mod = obj.modifiers.new("Armature", 'ARMATURE')
-            mod.object = vmodel_obj
-        
-        bound_obj = read_ybn_xml(context, self.filepath, root)
-        
-        if bound_obj is not None:
-            bound_obj.parent = vmodel_obj
-            context.scene.collection.objects.link(bound_obj)
-        
-        #set sollum properties 
-        dd_high = float(root.find("LodDistHigh").attrib["value"])
-        dd_med = float(root.find("LodDistMed").attrib["value"])
-        dd_low = float(root.find("LodDistLow").attrib["value"])
-        dd_vlow = float(root.find("LodDistVlow").attrib["value"])
-        
-        vmodel_obj.sollumtype = "Drawable"
-        vmodel_obj.drawble_distance_high = dd_high 
-        vmodel_obj.drawble_distance_medium = dd_med
-        vmodel_obj.drawble_distance_low = dd_low
-        vmodel_obj.drawble_distance_vlow = dd_vlow
+        for filepath in get_import_filepaths(self):
+            file_start = time.time()
+            import_ydr(self, context, filepath, material_cache, textures, collision_materials)
+            print_import_time(filepath, file_start)
 
         finished = time.time()
         
@@ -795,7 +993,7 @@ class ImportYDR(Operator, ImportHelper):
                 
         return {'FINISHED'}
 
-class ImportYDD(Operator, ImportHelper):
+class ImportYDD(Operator, ModalImportHelper, DrawableImportOptions, ImportCacheOptions):
     """This appears in the tooltip of the operator and in the generated docs"""
     bl_idname = "importxml.ydd"  # important since its how bpy.ops.import_test.some_data is constructed
     bl_label = "Import Ydd"
@@ -809,49 +1007,110 @@ class ImportYDD(Operator, ImportHelper):
         maxlen=255,  # Max internal buffer length, longer would be clamped.
     )
 
-    def execute(self, context):
-        start = time.time()
+    parallel_parse: BoolProperty(
+        name="Parallel Parse",
+        description="Decode the drawables of the dictionary in worker processes on all cores before building them",
+        default=False,
+    )
 
-        tree = ET.parse(self.filepath)
-        root = tree.getroot()
+    def import_steps(self, context):
+        start = time.time()
+        progress = self.progress
 
         name = os.path.basename(self.filepath)[:-8]
         vmodels = []
         # bones are shared in single ydd however they still have to be placed under a paticular drawable
-        # temp armature, to be merged
-        armature_temp = bpy.data.armatures.new("ARMATURE_TEMP")
-        armature_temp_obj = bpy.data.objects.new("ARMATURE_TEMP", armature_temp)
-        context.scene.collection.objects.link(armature_temp_obj)
-        context.view_layer.objects.active = armature_temp_obj
+        # they are read into this armature, which then becomes the object of that drawable
+        armature_with_bones = bpy.data.armatures.new(name + ".skel")
+        armature_with_bones_obj = bpy.data.objects.new(name + ".skel", armature_with_bones)
+        context.scene.collection.objects.link(armature_with_bones_obj)
+        context.view_layer.objects.active = armature_with_bones_obj
 
         drawable_with_bones_name = None
-        armature_with_bones_obj = None
+        bones_drawable_found = False
 
         mod_objs = []
-        ydd_objs, drawable_with_bones_name = read_ydd_xml(self, context, self.filepath, root)
-        for ydd in ydd_objs:
-            drawable_name = ydd[0].name.split('.')[0][:-5]
-            armature = bpy.data.armatures.new(drawable_name + ".skel")
-            # mesh has "_mesh" at the end of its name, so remove that for the parented armature
-            vmodel_obj = bpy.data.objects.new(drawable_name, armature)
-            context.scene.collection.objects.link(vmodel_obj)
-            if (armature_with_bones_obj == None and drawable_with_bones_name != None and drawable_name == drawable_with_bones_name):
-                armature_with_bones_obj = vmodel_obj
+        # bones go to this armature even when another object got active between two steps
+        reader = DrawableStreamReader(self, context, self.filepath, share_bones=True, armature=armature_with_bones_obj)
+        # every yield gets back the context of the modal call that continues the import
+        try:
+            if self.stream_xml and not (self.parallel_parse or self.use_cache):
+                progress.begin_stage("Reading and building geometries")
+                for step in reader.read_steps():
+                    progress.step()
+                    context = yield
+                    reader.context = context
+                root = reader.root
+            else:
+                progress.begin_stage("Reading", 1)
+                if self.parallel_parse or self.use_cache:
+                    parsed = parse_drawable_file(self, self.filepath, dictionary=True)
+                    root = ET.Element("DrawableDictionary")
+                    for drawable, buffers in parsed:
+                        root.append(drawable)
+                else:
+                    root = ET.parse(self.filepath).getroot()
+                    parsed = [(drawable, None) for drawable in root]
+                progress.step()
+                context = yield
+                reader.context = context
+
+                progress.begin_stage("Building drawables", len(parsed))
+                reader.read_skeleton(root)
+                for drawable, buffers in parsed:
+                    reader.read_parsed(drawable, buffers)
+                    progress.step()
+                    context = yield
+                    reader.context = context
+        except GeneratorExit:
+            # cancelled, the geometry built so far was never linked to the scene
+            reader.remove_objects()
+            bpy.data.objects.remove(armature_with_bones_obj)
+            bpy.data.armatures.remove(armature_with_bones)
+            raise
+
+        progress.begin_stage("Linking objects")
+        ydd_objs = [reader.get_objects(ydr) for ydr in root]
+        drawable_with_bones_name = reader.bones_drawable_name
+
+        # ydd_objs holds the objects of every drawable in the same order as the xml items
+        for ydr, ydd in zip(root, ydd_objs):
+            if len(ydd) > 0:
+                drawable_name = ydd[0].name.split('.')[0][:-5]
+            else:
+                # all of its geometry is in lods that were not imported
+                drawable_name = get_drawable_name(self.filepath, ydr).replace(".#dr", "")
+
+            if (not bones_drawable_found and drawable_with_bones_name != None and ydr.find("Name").text.split(".")[0] == drawable_with_bones_name):
+                vmodel_obj = armature_with_bones_obj
+                vmodel_obj.name = drawable_name
+                vmodel_obj.data.name = drawable_name + ".skel"
+                bones_drawable_found = True
+            else:
+                armature = bpy.data.armatures.new(drawable_name + ".skel")
+                # mesh has "_mesh" at the end of its name, so remove that for the parented armature
+                vmodel_obj = bpy.data.objects.new(drawable_name, armature)
+                context.scene.collection.objects.link(vmodel_obj)
 
             for obj in ydd:
                 context.scene.collection.objects.link(obj)
                 obj.parent = vmodel_obj
                 mod_objs.append(obj)    
         
-            for ydr in root:
-                bound_obj = read_ybn_xml(context, self.filepath, ydr)
-                if(bound_obj != None):
-                    bound_obj.parent = vmodel_obj
-                    context.scene.collection.link(bound_obj)
+            bound_obj = read_ybn_xml(context, self.filepath, ydr)
+            if(bound_obj != None):
+                bound_obj.parent = vmodel_obj
+                context.scene.collection.objects.link(bound_obj)
                     
             vmodel_obj.sollumtype = "Drawable"
             vmodels.append(vmodel_obj)
         
+        # no drawable has a skeleton, the armature holds no bones and isn't needed
+        if not bones_drawable_found:
+            bpy.data.objects.remove(armature_with_bones_obj)
+            bpy.data.armatures.remove(armature_with_bones)
+            armature_with_bones_obj = vmodels[0]
+
         vmodel_dict_obj = bpy.data.objects.new(name, None)
         vmodel_dict_obj.sollumtype = "Drawable Dictionary"
 
@@ -860,18 +1119,11 @@ class ImportYDD(Operator, ImportHelper):
         
         context.scene.collection.objects.link(vmodel_dict_obj)
 
-        if (armature_with_bones_obj == None):
-            armature_with_bones_obj = vmodels[0]
-
         for obj in mod_objs:
             mod = obj.modifiers.new("Armature", 'ARMATURE')
             mod.object = armature_with_bones_obj
 
-        bpy.ops.object.select_all(action='DESELECT')
-        armature_temp_obj.select_set(True)
-        armature_with_bones_obj.select_set(True)
         context.view_layer.objects.active = armature_with_bones_obj
-        bpy.ops.object.join()
 
         finished = time.time()
         
@@ -882,9 +1134,6 @@ class ImportYDD(Operator, ImportHelper):
         print("difference in seconds: " + str(difference))
         print("difference in milliseconds: " + str(difference * 1000))
 
-        return {'FINISHED'}
-
-
 # Only needed if you want to add into a dynamic menu
 def menu_func_import_ydr(self, context):
     self.layout.operator(ImportYDR.bl_idname, text="Ydr (.ydr.xml)")
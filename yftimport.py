@@ -8,98 +8,128 @@ from bpy.types import Operator
 import time
 import random 
 from .tools import cats as Cats
-from .ydrimport import read_ydr_xml, read_ydr_shaders, build_bones_dict
+from .ydrimport import read_ydr_xml, read_ydr_shaders, build_bones_dict, DrawableStreamReader, get_texture_resolver
 from .ybnimport import read_composite_info
+from .tools.importoptions import DrawableImportOptions, MultiFileImportOptions, get_import_filepaths, print_import_time
+
+def import_yft(self, context, filepath, material_cache, textures, collision_materials):
+    # the fragment name is only known once the file is read
+    name = os.path.basename(filepath)[:-8]
+    armature = bpy.data.armatures.new(name + ".skel")
+    node_fragment = bpy.data.objects.new(name, armature)
+    context.scene.collection.objects.link(node_fragment)
+    context.view_layer.objects.active = node_fragment
+
+    reader = None
+    if self.stream_xml:
+        # child drawables use the shaders of the main drawable
+        reader = DrawableStreamReader(self, context, filepath, share_shaders=True, material_cache=material_cache, textures=textures)
+        root = reader.read()
+    else:
+        tree = ET.parse(filepath)
+        root = tree.getroot()
 
-class ImportYFT(Operator, ImportHelper):
-    """This appears in the tooltip of the operator and in the generated docs"""
-    bl_idname = "importxml.yft"  # important since its how bpy.ops.import_test.some_data is constructed
-    bl_label = "Import Yft"
+    fragment_name = root.find("Name").text
+    armature.name = fragment_name + ".skel"
+    node_fragment.name = fragment_name
+
+    # Drawable
+    drawable = root.find('Drawable')
+    if reader != None:
+        ydr_objs = reader.get_objects(drawable)
+    else:
+        shaders = read_ydr_shaders(self, context, filepath, drawable, material_cache, textures)
+        ydr_objs = read_ydr_xml(self, context, filepath, drawable, shaders)
+    node_fragment.sollumtype = "Fragment"
+
+    for obj in ydr_objs:
+        context.scene.collection.objects.link(obj)
+        obj.parent = node_fragment
+        mod = obj.modifiers.new("Armature", 'ARMATURE')
+        mod.object = node_fragment
+
+    # Physics
+    Physics = root.find('Physics')
+    LOD1 = Physics.find('LOD1')
+    node_physics = bpy.data.objects.new('Physics', None)
+    context.scene.collection.objects.link(node_physics)
+    node_physics.parent = node_fragment
+
+    node_lod1 = bpy.data.objects.new('LOD1', None)
+    context.scene.collection.objects.link(node_lod1)
+    node_lod1.parent = node_physics
+
+    # Collision
+    archetype = LOD1.find('Archetype')
+
+    if archetype != None:
+        node_archetype = bpy.data.objects.new('Archetype', None)
+        context.scene.collection.objects.link(node_archetype)
+        node_archetype.parent = node_lod1
+
+        archetype_name = archetype.find('Name').text
+        bounds = archetype.find('Bounds')
+        
+        node_bounds = read_composite_info(archetype_name, bounds, collision_materials)
+        context.scene.collection.objects.link(node_bounds)
+        node_bounds.parent = node_archetype
 
-    # ImportHelper mixin class uses this
-    filename_ext = ".yft.xml"
+    bones_dict = build_bones_dict(node_fragment)
 
-    filter_glob: StringProperty(
-        default="*.yft.xml",
-        options={'HIDDEN'},
-        maxlen=255,  # Max internal buffer length, longer would be clamped.
-    )
+    for item in LOD1.find('Children').getchildren():
 
-    def execute(self, context):
-        start = time.time()
+        bone_tag = int(item.find('BoneTag').get('value'))
 
-        tree = ET.parse(self.filepath)
-        root = tree.getroot()
+        loc = armature.bones[bones_dict[bone_tag]].head
 
-        fragment_name = root.find("Name").text
+        node_item = bpy.data.objects.new('Item', None)
+        context.scene.collection.objects.link(node_item)
+        node_item.parent = node_lod1
 
-        armature = bpy.data.armatures.new(fragment_name + ".skel")
-        node_fragment = bpy.data.objects.new(fragment_name, armature)
-        context.scene.collection.objects.link(node_fragment)
-        context.view_layer.objects.active = node_fragment
+        item_drawable = item.find('Drawable')
+        if reader != None:
+            ydr_objs = reader.get_objects(item_drawable)
+        else:
+            ydr_objs = read_ydr_xml(self, context, filepath, item_drawable, shaders)
+        # matrix = list(map(lambda line : line.strip().split(), item_drawable.find('Matrix').text.strip().split('\n')))
 
-        # Drawable
-        drawable = root.find('Drawable')
-        shaders = read_ydr_shaders(self, context, self.filepath, drawable)
-        ydr_objs = read_ydr_xml(self, context, self.filepath, drawable, shaders)
-        node_fragment.sollumtype = "Fragment"
+        node_item.location = loc # should be somehow offsetted
+        
 
         for obj in ydr_objs:
             context.scene.collection.objects.link(obj)
-            obj.parent = node_fragment
+            obj.parent = node_item
             mod = obj.modifiers.new("Armature", 'ARMATURE')
             mod.object = node_fragment
 
-        # Physics
-        Physics = root.find('Physics')
-        LOD1 = Physics.find('LOD1')
-        node_physics = bpy.data.objects.new('Physics', None)
-        context.scene.collection.objects.link(node_physics)
-        node_physics.parent = node_fragment
-
-        node_lod1 = bpy.data.objects.new('LOD1', None)
-        context.scene.collection.objects.link(node_lod1)
-        node_lod1.parent = node_physics
+    return node_fragment
 
-        # Collision
-        archetype = LOD1.find('Archetype')
-
-        if archetype != None:
-            node_archetype = bpy.data.objects.new('Archetype', None)
-            context.scene.collection.objects.link(node_archetype)
-            node_archetype.parent = node_lod1
-
-            archetype_name = archetype.find('Name').text
-            bounds = archetype.find('Bounds')
-            
-            node_bounds = read_composite_info(archetype_name, bounds)
-            context.scene.collection.objects.link(node_bounds)
-            node_bounds.parent = node_archetype
-
-        bones_dict = build_bones_dict(node_fragment)
-
-        for item in LOD1.find('Children').getchildren():
-
-            bone_tag = int(item.find('BoneTag').get('value'))
+class ImportYFT(Operator, ImportHelper, DrawableImportOptions, MultiFileImportOptions):
+    """This appears in the tooltip of the operator and in the generated docs"""
+    bl_idname = "importxml.yft"  # important since its how bpy.ops.import_test.some_data is constructed
+    bl_label = "Import Yft"
 
-            loc = armature.bones[bones_dict[bone_tag]].head
+    # ImportHelper mixin class uses this
+    filename_ext = ".yft.xml"
 
-            node_item = bpy.data.objects.new('Item', None)
-            context.scene.collection.objects.link(node_item)
-            node_item.parent = node_lod1
+    filter_glob: StringProperty(
+        default="*.yft.xml",
+        options={'HIDDEN'},
+        maxlen=255,  # Max internal buffer length, longer would be clamped.
+    )
 
-            item_drawable = item.find('Drawable')
-            ydr_objs = read_ydr_xml(self, context, self.filepath, item_drawable, shaders)
-            # matrix = list(map(lambda line : line.strip().split(), item_drawable.find('Matrix').text.strip().split('\n')))
+    def execute(self, context):
+        start = time.time()
 
-            node_item.location = loc # should be somehow offsetted
-            
+        # materials, images and collision materials are shared by every selected file
+        material_cache = {}
+        textures = get_texture_resolver(self)
+        collision_materials = {}
 
-            for obj in ydr_objs:
-                context.scene.collection.objects.link(obj)
-                obj.parent = node_item
-                mod = obj.modifiers.new("Armature", 'ARMATURE')
-                mod.object = node_fragment
+        for filepath in get_import_filepaths(self):
+            file_start = time.time()
+            import_yft(self, context, filepath, material_cache, textures, collision_materials)
+            print_import_time(filepath, file_start)
 
         finished = time.time()
         